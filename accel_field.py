@@ -0,0 +1,190 @@
+"""Precomputed acceleration grid for maps whose bodies never move.
+
+AccelerationField samples the summed pull of the planets and black holes
+once per map and answers lookups by bilinear interpolation, so a step costs
+the same however many bodies there are. field_for() keeps one field per map
+and rebuilds it when the bodies or settings change.
+
+    python accel_field.py  # interpolation error against the exact sum on seeded maps
+"""
+import math
+import random
+
+import numpy as np
+
+from physics import exact_acceleration
+
+
+class _Grid:
+    """Acceleration sampled on a regular lattice, with bilinear lookups"""
+
+    def __init__(self, x0, y0, cell, nx, ny, gravity_objects, black_holes):
+        self.x0 = x0
+        self.y0 = y0
+        self.cell = cell
+        self.nx = nx
+        self.ny = ny
+        self.x1 = x0 + cell * (nx - 1)
+        self.y1 = y0 + cell * (ny - 1)
+
+        gx, gy = np.meshgrid(x0 + cell * np.arange(nx), y0 + cell * np.arange(ny), indexing='ij')
+        self.ax, self.ay = exact_acceleration(gx, gy, gravity_objects, black_holes)
+        # Nested lists are much quicker than NumPy for one point at a time
+        self._ax_rows = self.ax.tolist()
+        self._ay_rows = self.ay.tolist()
+
+    def contains(self, x, y):
+        return self.x0 <= x <= self.x1 and self.y0 <= y <= self.y1
+
+    def sample(self, x, y):
+        fx = min(max((x - self.x0) / self.cell, 0.0), self.nx - 1.000001)
+        fy = min(max((y - self.y0) / self.cell, 0.0), self.ny - 1.000001)
+        i = int(fx)
+        j = int(fy)
+        tx = fx - i
+        ty = fy - j
+
+        ax0, ax1 = self._ax_rows[i], self._ax_rows[i + 1]
+        ay0, ay1 = self._ay_rows[i], self._ay_rows[i + 1]
+        w00 = (1 - tx) * (1 - ty)
+        w10 = tx * (1 - ty)
+        w01 = (1 - tx) * ty
+        w11 = tx * ty
+        return (ax0[j] * w00 + ax1[j] * w10 + ax0[j + 1] * w01 + ax1[j + 1] * w11,
+                ay0[j] * w00 + ay1[j] * w10 + ay0[j + 1] * w01 + ay1[j + 1] * w11)
+
+    def sample_many(self, x, y):
+        fx = np.clip((x - self.x0) / self.cell, 0.0, self.nx - 1.000001)
+        fy = np.clip((y - self.y0) / self.cell, 0.0, self.ny - 1.000001)
+        i = fx.astype(np.intp)
+        j = fy.astype(np.intp)
+        tx = fx - i
+        ty = fy - j
+
+        w00 = (1 - tx) * (1 - ty)
+        w10 = tx * (1 - ty)
+        w01 = (1 - tx) * ty
+        w11 = tx * ty
+        ax = (self.ax[i, j] * w00 + self.ax[i + 1, j] * w10 +
+              self.ax[i, j + 1] * w01 + self.ax[i + 1, j + 1] * w11)
+        ay = (self.ay[i, j] * w00 + self.ay[i + 1, j] * w10 +
+              self.ay[i, j + 1] * w01 + self.ay[i + 1, j + 1] * w11)
+        return ax, ay
+
+
+class AccelerationField:
+    """Cached combined planet + black hole acceleration over the playfield.
+
+    Planets and black holes never move during a match, so the summed pull is
+    sampled once onto a coarse grid covering the screen, plus a finer patch
+    around each black hole where the field changes fastest. Lookups are
+    bilinear. The field remembers the bodies it was built from; use
+    field_for() to get a field that is rebuilt whenever they change.
+    """
+
+    def __init__(self, gravity_objects, black_holes, width, height,
+                 cell=8, fine_cell=2, fine_radius=150, refine_planets=False):
+        self.signature = field_signature(gravity_objects, black_holes)
+        self.width = width
+        self.height = height
+        # What field_for() needs to build the same field elsewhere (aim_search's workers)
+        self.options = {'cell': cell, 'fine_cell': fine_cell, 'fine_radius': fine_radius,
+                        'refine_planets': refine_planets}
+        self.gravity_objects = list(gravity_objects)
+        self.black_holes = list(black_holes)
+
+        self.coarse = _Grid(0, 0, cell,
+                            int(math.ceil(width / cell)) + 1, int(math.ceil(height / cell)) + 1,
+                            gravity_objects, black_holes)
+
+        # Fine patches around the steepest parts of the field
+        refined = list(black_holes) + (list(gravity_objects) if refine_planets else [])
+        steps = int(math.ceil(2 * fine_radius / fine_cell)) + 1
+        self.patches = [_Grid(body.x - fine_radius, body.y - fine_radius, fine_cell, steps, steps,
+                              gravity_objects, black_holes)
+                        for body in refined]
+
+    def matches(self, gravity_objects, black_holes):
+        return self.signature == field_signature(gravity_objects, black_holes)
+
+    def sample(self, x, y):
+        """Acceleration at one point, as (ax, ay)"""
+        for patch in self.patches:
+            if patch.contains(x, y):
+                return patch.sample(x, y)
+        return self.coarse.sample(x, y)
+
+    def sample_many(self, x, y):
+        """Acceleration at arrays of points, as (ax, ay) arrays"""
+        ax, ay = self.coarse.sample_many(x, y)
+        for patch in self.patches:
+            inside = (x >= patch.x0) & (x <= patch.x1) & (y >= patch.y0) & (y <= patch.y1)
+            if inside.any():
+                ax[inside], ay[inside] = patch.sample_many(x[inside], y[inside])
+        return ax, ay
+
+    def error_report(self, samples=20000, seed=0):
+        """Interpolation error against the exact sum at random playfield points.
+
+        Points inside an event horizon are skipped since nothing flies there.
+        Returns max/mean absolute error and mean/99th percentile relative
+        error of |a|; the worst cases sit inside planets, which have no
+        collision.
+        """
+        rng = np.random.default_rng(seed)
+        x = rng.uniform(0, self.width, samples)
+        y = rng.uniform(0, self.height, samples)
+        for bh in self.black_holes:
+            keep = np.hypot(x - bh.x, y - bh.y) >= bh.event_horizon
+            x, y = x[keep], y[keep]
+
+        exact_x, exact_y = exact_acceleration(x, y, self.gravity_objects, self.black_holes)
+        field_x, field_y = self.sample_many(x, y)
+        error = np.hypot(field_x - exact_x, field_y - exact_y)
+        magnitude = np.hypot(exact_x, exact_y)
+        return {
+            'samples': len(x),
+            'max_abs': float(error.max()),
+            'mean_abs': float(error.mean()),
+            'mean_rel': float((error / magnitude).mean()),
+            'p99_rel': float(np.percentile(error / magnitude, 99)),
+        }
+
+
+def field_signature(gravity_objects, black_holes):
+    return (tuple((obj.x, obj.y, obj.mass) for obj in gravity_objects),
+            tuple((bh.x, bh.y, bh.mass) for bh in black_holes))
+
+
+_cached_field = None
+_cached_settings = None
+
+
+def field_for(gravity_objects, black_holes, width, height, **options):
+    """The cached field for these bodies, rebuilt if they or the settings changed"""
+    global _cached_field, _cached_settings
+    settings = (width, height, tuple(sorted(options.items())))
+    if (_cached_field is None or settings != _cached_settings
+            or not _cached_field.matches(gravity_objects, black_holes)):
+        _cached_field = AccelerationField(gravity_objects, black_holes, width, height, **options)
+        _cached_settings = settings
+    return _cached_field
+
+
+def main(seeds=range(5), cells=(4, 8, 16)):
+    from core import HEIGHT, WIDTH, create_launch_pads, create_map
+
+    print(f"{'seed':>4} {'cell':>4} {'mean rel':>9} {'p99 rel':>9} {'mean abs':>9}")
+    for seed in seeds:
+        rng = random.Random(seed)
+        launch_pads = create_launch_pads(rng=rng)
+        gravity_objects, black_holes, _ = create_map(launch_pads, rng=rng)
+        for cell in cells:
+            report = AccelerationField(gravity_objects, black_holes, WIDTH, HEIGHT,
+                                       cell=cell).error_report()
+            print(f"{seed:4d} {cell:4d} {report['mean_rel']:9.5f} {report['p99_rel']:9.5f} "
+                  f"{report['mean_abs']:9.5f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import concurrent.futures
+import multiprocessing
+from collections import namedtuple
+
+import numpy as np
+
+from accel_field import AccelerationField, field_for
+from barnes_hut import GravityTree, tree_for
+from physics import search_shot
+
+# Plain picklable stand-ins for the game objects shipped to the workers
+Body = namedtuple('Body', 'x y mass')
+Hole = namedtuple('Hole', 'x y mass event_horizon')
+GameMap = namedtuple('GameMap', 'origin_x origin_y target_x target_y planets holes width height')
+
+# Shared search generation, set in every worker by _init_worker
+_generation = None
+
+
+def _init_worker(generation):
+    global _generation
+    _generation = generation
+
+
+def field_spec(field):
+    """Picklable (kind, options) to rebuild field in a worker; None for exact gravity"""
+    if field is None:
+        return None
+    if isinstance(field, GravityTree):
+        return ('tree', field.options)
+    if isinstance(field, AccelerationField):
+        return ('grid', dict(field.options, width=field.width, height=field.height))
+    raise TypeError(f"can't ship a {type(field).__name__} to the search workers")
+
+
+def _worker_field(spec, game_map):
+    """The field spec describes, for this map (cached in the worker like in the game)"""
+    if spec is None:
+        return None
+    kind, options = spec
+    if kind == 'tree':
+        return tree_for(game_map.planets, game_map.holes, **options)
+    return field_for(game_map.planets, game_map.holes, **options)
+
+
+def _search_shard(generation, game_map, angle_range, budget, map_id=None, spec=None):
+    """Search one range of angles and return its best (score, angle, power, simulations)"""
+    # The search was cancelled while this shard sat in the queue
+    if _generation.value != generation:
+        return None
+
+    return search_shot(game_map.origin_x, game_map.origin_y,
+                       game_map.target_x, game_map.target_y,
+                       game_map.planets, game_map.holes, game_map.width, game_map.height,
+                       budget=budget, angle_range=angle_range,
+                       field=_worker_field(spec, game_map),
+                       map_key=None if map_id is None else (map_id, spec is None))
+
+
+class ParallelAimSearch:
+    """Shards the hard-mode coarse-to-fine search across a process pool.
+
+    start() freezes the map into plain tuples once per turn and gives each
+    shard an equal range of angles and an equal share of the simulation
+    budget (the remainder going to the first shards), so the shards together
+    score as many shots as one search would; the render thread polls done()
+    every frame and picks up the merged best shot with result() (simulations
+    then holds the total the shards ran). The game's acceleration field or
+    gravity tree goes along as its settings, and each worker rebuilds and
+    keeps the same one, so shots are scored with the forces the missile will
+    fly through. With a map_id each worker keeps the paths it flew in its own
+    physics.trajectory_cache for the next turn on that map. cancel() bumps a
+    shared generation counter, so queued shards are dropped and late results
+    are ignored.
+    """
+
+    def __init__(self, workers, shards_per_worker=1):
+        self.workers = workers
+        self.shards_per_worker = shards_per_worker
+        self._generation = multiprocessing.Value('i', 0)
+        self._pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(self._generation,))
+        self._futures = []
+        self.simulations = 0
+
+    def start(self, cpu_pad, target_pad, gravity_objects, black_holes,
+              budget, width, height, map_id=None, field=None):
+        """Queue a search for the best shot from cpu_pad at target_pad"""
+        self.cancel()
+        generation = self._generation.value
+        spec = field_spec(field)
+
+        game_map = GameMap(cpu_pad.x, cpu_pad.y, target_pad.x, target_pad.y,
+                           tuple(Body(obj.x, obj.y, obj.mass) for obj in gravity_objects),
+                           tuple(Hole(bh.x, bh.y, bh.mass, bh.event_horizon) for bh in black_holes),
+                           width, height)
+
+        num_shards = self.workers * self.shards_per_worker
+        edges = np.linspace(-180, 180, num_shards + 1)
+        share, extra = divmod(budget, num_shards)
+        for shard, (start, stop) in enumerate(zip(edges[:-1], edges[1:])):
+            self._futures.append(self._pool.submit(
+                _search_shard, generation, game_map, (float(start), float(stop)),
+                share + (shard < extra), map_id, spec))
+
+    def done(self):
+        return all(future.done() for future in self._futures)
+
+    def result(self):
+        """Merge the shard results into the best (angle, power), or None"""
+        best = None
+        self.simulations = 0
+        for future in self._futures:
+            if future.cancelled() or future.exception() is not None:
+                continue
+            shard_best = future.result()
+            if shard_best is None:
+                continue
+            self.simulations += shard_best[3]
+            # Ties go to the earliest shard, like a single argmin would
+            if best is None or shard_best[0] < best[0]:
+                best = shard_best
+        self._futures = []
+        if best is None:
+            return None
+        return best[1], best[2]
+
+    def cancel(self):
+        """Abandon the current search (queued shards are skipped)"""
+        with self._generation.get_lock():
+            self._generation.value += 1
+        for future in self._futures:
+            future.cancel()
+        self._futures = []
+
+    def shutdown(self):
+        self.cancel()
+        # Running shards finish in milliseconds; waiting keeps interpreter exit clean
+        self._pool.shutdown(wait=True, cancel_futures=True)
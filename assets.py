@@ -0,0 +1,121 @@
+"""Sounds, music and the background, loaded on worker threads.
+
+The menu only needs the display to be up, so main.py starts an AssetLoader
+and draws its first frame straight away: the mixer opens and the sounds
+load in the background (play() skips sounds that aren't ready yet), and the
+background shows up on the first frame after it is decoded. Decoding and
+scaling bg5.jpg is most of the work, so the scaled pixels are kept in
+CACHE_DIR keyed by a hash of the image and the screen size; later starts
+just read them back.
+"""
+import concurrent.futures
+import hashlib
+import io
+import os
+import time
+
+import pygame
+
+# name -> (file, volume)
+SOUND_FILES = {
+    'explode': ('sound/explode.wav', 0.15),
+    'hit': ('sound/hit.wav', 0.125),
+    'choose': ('sound/shoot.wav', 0.125),
+    'fire': ('sound/fire.wav', 0.125),
+}
+MUSIC_FILE = 'sound/boss.ogg'
+MUSIC_VOLUME = 0.25
+BACKGROUND_FILE = 'bg5.jpg'
+CACHE_DIR = 'cache'
+
+
+def load_background(path, size, cache_dir=CACHE_DIR):
+    """(surface, from_cache): the image at path scaled to size, not yet convert()ed.
+
+    The scaled pixels are cached under cache_dir by the file's hash and the
+    size, so changing either makes a new entry instead of a stale read.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    width, height = size
+    name = os.path.splitext(os.path.basename(path))[0]
+    digest = hashlib.sha1(data).hexdigest()[:16]
+    cached = os.path.join(cache_dir, f"{name}-{digest}-{width}x{height}.rgb")
+    try:
+        with open(cached, 'rb') as f:
+            pixels = f.read()
+        if len(pixels) == width * height * 3:
+            return pygame.image.frombytes(pixels, size, 'RGB'), True
+    except OSError:
+        pass
+
+    image = pygame.transform.scale(pygame.image.load(io.BytesIO(data), path), size)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Written aside and renamed so a crash never leaves a short file behind
+        with open(cached + '.tmp', 'wb') as f:
+            f.write(pygame.image.tobytes(image, 'RGB'))
+        os.replace(cached + '.tmp', cached)
+    except OSError as error:
+        print(f"Could not cache the background: {error}")
+    return image, False
+
+
+class AssetLoader:
+    """Loads the audio and background on worker threads.
+
+    sounds maps each SOUND_FILES name to its Sound, or None until it has
+    loaded (or when it couldn't be); background is None until poll() picks
+    it up; with audio off the mixer is never opened. timings records the
+    seconds from the loader's start until each asset was ready, for
+    --measure-startup.
+    """
+
+    def __init__(self, size, audio=True, workers=2):
+        self.start = time.perf_counter()
+        self.sounds = dict.fromkeys(SOUND_FILES)
+        self.background = None
+        self.background_cached = None
+        self.timings = {}
+        pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers,
+                                                     thread_name_prefix="assets")
+        self._audio = pool.submit(self._load_audio) if audio else None
+        self._background = pool.submit(load_background, BACKGROUND_FILE, size)
+        # The workers exit once these are done
+        pool.shutdown(wait=False)
+
+    def _load_audio(self):
+        try:
+            pygame.mixer.init()
+            for name, (path, volume) in SOUND_FILES.items():
+                sound = pygame.mixer.Sound(path)
+                sound.set_volume(volume)
+                self.sounds[name] = sound
+            self.timings['sounds'] = time.perf_counter() - self.start
+            # Background music
+            pygame.mixer.music.load(MUSIC_FILE)
+            pygame.mixer.music.set_volume(MUSIC_VOLUME)
+            pygame.mixer.music.play(-1)  # Loop forever
+            self.timings['music'] = time.perf_counter() - self.start
+        except (pygame.error, OSError):
+            print("Sound files not found - continuing without sound")
+
+    def poll(self):
+        """Take the background once it has loaded; True on the call it arrives"""
+        future = self._background
+        if future is None or not future.done():
+            return False
+        self._background = None
+        try:
+            image, self.background_cached = future.result()
+        except (pygame.error, OSError):
+            print("Background image not found - using black background")
+            return False
+        # Converted here, on the thread that owns the display
+        self.background = image.convert()
+        self.timings['background'] = time.perf_counter() - self.start
+        return True
+
+    @property
+    def done(self):
+        return self._background is None and (self._audio is None or self._audio.done())
@@ -0,0 +1,139 @@
+"""Sound effects through a fixed budget of mixer channels.
+
+Match.update queues ('explode', x, y)-style events instead of playing
+anything, and an asteroid's fragment shower can queue dozens of them within
+a few frames. SoundManager turns those requests into at most one play per
+sound per `window` frames (the loudest request wins), quieter the further
+from the listener they happen, on at most `channels` channels: when all are
+busy a sound takes the channel of a lower priority one or is dropped.
+NullAudio is the backend for headless runs and --mute, where play() returns
+before doing any work.
+"""
+import math
+
+import pygame
+
+from core import HEIGHT, WIDTH
+
+# Higher plays over lower when every channel is busy
+SOUND_PRIORITIES = {'hit': 3, 'explode': 2, 'fire': 1, 'choose': 1}
+
+# Volume falls off linearly with distance to MIN_GAIN at FALLOFF pixels
+MIN_GAIN = 0.35
+FALLOFF = math.hypot(WIDTH, HEIGHT)
+
+
+class NullAudio:
+    """A backend that plays nothing"""
+    silent = True
+
+    def play(self, channel, name, volume):
+        return False
+
+    def busy(self, channel):
+        return False
+
+
+class MixerAudio:
+    """pygame.mixer backend playing the Sounds in sounds (None entries are skipped).
+
+    The mixer may still be opening on the asset loader's thread, so the
+    channels are claimed on the first play after it is up.
+    """
+    silent = False
+
+    def __init__(self, sounds, channels):
+        self.sounds = sounds
+        self.count = channels
+        self.channels = None
+
+    def _open(self):
+        if self.channels is None:
+            if not pygame.mixer.get_init():
+                return False
+            pygame.mixer.set_num_channels(self.count)
+            self.channels = [pygame.mixer.Channel(i) for i in range(self.count)]
+        return True
+
+    def play(self, channel, name, volume):
+        sound = self.sounds.get(name)
+        if sound is None or not self._open():
+            return False
+        self.channels[channel].play(sound)
+        self.channels[channel].set_volume(volume)
+        return True
+
+    def busy(self, channel):
+        return bool(self.channels) and self.channels[channel].get_busy()
+
+
+class SoundManager:
+    """Coalesces, prioritizes and places sound requests; update() once a frame plays them.
+
+    played, coalesced (merged into a recent or louder play of the same
+    sound), stolen (took a lower priority sound's channel) and dropped (no
+    channel free) count what happened to the requests.
+    """
+
+    def __init__(self, backend, channels=8, window=3, listener=(WIDTH / 2, HEIGHT / 2)):
+        self.backend = backend
+        self.channels = channels
+        self.window = window
+        self.listener = listener
+        self.frame = 0
+        self.pending = {}  # name -> loudest volume requested this frame
+        self.playing = [None] * channels  # (priority, name) last started on each channel
+        self.last_played = {}  # name -> frame it last started
+        self.played = 0
+        self.coalesced = 0
+        self.stolen = 0
+        self.dropped = 0
+
+    def play(self, name, x=None, y=None):
+        """Request name this frame, placed at x, y (None for interface sounds)"""
+        if self.backend.silent:
+            return
+        volume = 1.0
+        if x is not None:
+            distance = math.hypot(x - self.listener[0], y - self.listener[1])
+            volume = max(MIN_GAIN, 1 - (1 - MIN_GAIN) * distance / FALLOFF)
+        if name in self.pending:
+            self.coalesced += 1
+            if volume <= self.pending[name]:
+                return
+        self.pending[name] = volume
+
+    def update(self):
+        """Start this frame's requests, highest priority first"""
+        self.frame += 1
+        if not self.pending:
+            return
+        requests = sorted(self.pending.items(), key=lambda item: -SOUND_PRIORITIES.get(item[0], 0))
+        self.pending.clear()
+        for name, volume in requests:
+            last = self.last_played.get(name)
+            if last is not None and self.frame - last < self.window:
+                self.coalesced += 1
+                continue
+            priority = SOUND_PRIORITIES.get(name, 0)
+            channel = self._channel(priority)
+            if channel is None:
+                self.dropped += 1
+                continue
+            if self.backend.play(channel, name, volume):
+                self.playing[channel] = (priority, name)
+                self.last_played[name] = self.frame
+                self.played += 1
+
+    def _channel(self, priority):
+        """A free channel, else the lowest priority one below priority, else None"""
+        lowest = None
+        for channel, slot in enumerate(self.playing):
+            if slot is None or not self.backend.busy(channel):
+                return channel
+            if lowest is None or slot[0] < self.playing[lowest][0]:
+                lowest = channel
+        if self.playing[lowest][0] < priority:
+            self.stolen += 1
+            return lowest
+        return None
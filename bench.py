@@ -0,0 +1,385 @@
+"""Timing benchmarks for the physics, CPU aiming, map generation and drawing.
+
+Every case is set up from a fixed seed, so runs on the same machine time the
+same work. Results are JSON; compare them against a saved baseline to catch
+regressions:
+
+    python bench.py --out baseline.json
+    python bench.py --baseline baseline.json --threshold 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+from barnes_hut import GravityTree
+from core import (HEIGHT, WIDTH, CPUPlayer, create_asteroids, create_black_holes,
+                  create_gravity_objects, create_launch_pads, create_map, simplify_trail)
+from placement import Placer
+
+SEED = 1234
+MISSILE_FRAMES = 100  # Frames per Missile.update run
+
+# name -> (setup, ops per run); setup(seed) returns the function to time
+BENCHMARKS = {}
+
+
+def benchmark(name, ops=1):
+    def register(setup):
+        BENCHMARKS[name] = (setup, ops)
+        return setup
+    return register
+
+
+def _scene(seed, mode="classic"):
+    """A seeded map: (gravity_objects, black_holes, asteroids, launch_pads)"""
+    random.seed(seed)
+    launch_pads = create_launch_pads(True, "hard")
+    gravity_objects, black_holes, asteroids = create_map(launch_pads, mode)
+    return gravity_objects, black_holes, asteroids, launch_pads
+
+
+def _volley(launch_pads, count, seed):
+    """count missiles fired from the left pad at seeded angles and powers"""
+    rng = random.Random(seed)
+    pad = launch_pads[0]
+    missiles = []
+    for _ in range(count):
+        pad.angle = rng.uniform(-90, 0)
+        pad.power = rng.uniform(8, 16)
+        missiles.append(pad.fire())
+    return missiles
+
+
+# Physics
+
+@benchmark("gravity_force", ops=1000)
+def _gravity_force(seed):
+    """Pull of every body on the map at one point, per op"""
+    gravity_objects, black_holes, _, _ = _scene(seed)
+    rng = random.Random(seed)
+    points = [(rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT)) for _ in range(1000)]
+    bodies = gravity_objects + black_holes
+
+    def run():
+        for x, y in points:
+            for body in bodies:
+                body.get_gravity_force(x, y)
+    return run
+
+
+def _missile_update(count):
+    def setup(seed):
+        gravity_objects, black_holes, _, launch_pads = _scene(seed)
+        missiles = _volley(launch_pads, count, seed)
+
+        def run():
+            for _ in range(MISSILE_FRAMES):
+                for missile in missiles:
+                    if missile.active:
+                        missile.update(gravity_objects, black_holes)
+        return run
+    return setup
+
+
+benchmark("missile_update_1", ops=MISSILE_FRAMES)(_missile_update(1))
+benchmark("missile_update_50", ops=MISSILE_FRAMES * 50)(_missile_update(50))
+
+
+@benchmark("swarm_update_50", ops=MISSILE_FRAMES * 50)
+def _swarm_update(seed):
+    """missile_update_50's volley stepped by the batched MissileSwarm"""
+    from physics import MissileSwarm
+
+    gravity_objects, black_holes, _, launch_pads = _scene(seed)
+    missiles = _volley(launch_pads, 50, seed)
+    swarm = MissileSwarm(WIDTH, HEIGHT)
+
+    def run():
+        for _ in range(MISSILE_FRAMES):
+            swarm.update(missiles, gravity_objects, black_holes)
+    return run
+
+
+@benchmark("simulate_shot", ops=10)
+def _simulate_shot(seed):
+    gravity_objects, black_holes, _, launch_pads = _scene(seed)
+    cpu = CPUPlayer("medium")
+    rng = random.Random(seed)
+    shots = [(rng.uniform(-180, 180), rng.uniform(8, 20)) for _ in range(10)]
+
+    def run():
+        for angle, power in shots:
+            cpu.simulate_shot(launch_pads[1], launch_pads[0], angle, power,
+                              gravity_objects, black_holes)
+    return run
+
+
+def _galaxy_sample(exact):
+    def setup(seed):
+        gravity_objects, black_holes, _, _ = _scene(seed, "galaxy")
+        tree = GravityTree(gravity_objects, black_holes,
+                           exact_below=len(gravity_objects) + len(black_holes) + 1 if exact else 0)
+        rng = random.Random(seed)
+        points = [(rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT)) for _ in range(1000)]
+
+        def run():
+            for x, y in points:
+                tree.sample(x, y)
+        return run
+    return setup
+
+
+# Pull at one point on a galaxy map (~240 bodies), per op
+benchmark("galaxy_direct_sample", ops=1000)(_galaxy_sample(True))
+benchmark("galaxy_tree_sample", ops=1000)(_galaxy_sample(False))
+
+
+# CPU aiming
+
+def _cpu_aim(difficulty):
+    def setup(seed):
+        gravity_objects, black_holes, _, launch_pads = _scene(seed)
+        cpu = CPUPlayer(difficulty)
+
+        def run():
+            # aim() jitters the result with the global RNG
+            random.seed(seed)
+            cpu.aim(launch_pads[1], launch_pads[0], gravity_objects, black_holes)
+        return run
+    return setup
+
+
+for _difficulty in ("easy", "medium", "hard"):
+    benchmark(f"cpu_aim_{_difficulty}")(_cpu_aim(_difficulty))
+
+
+@benchmark("cpu_aim_hard_repeat")
+def _cpu_aim_hard_repeat(seed):
+    """The next turn's aim from an unmoved pad, with the last turn's paths cached"""
+    gravity_objects, black_holes, _, launch_pads = _scene(seed)
+    cpu = CPUPlayer("hard", map_id=("bench", seed))
+    random.seed(seed)
+    cpu.aim(launch_pads[1], launch_pads[0], gravity_objects, black_holes)
+
+    def run():
+        random.seed(seed)
+        cpu.aim(launch_pads[1], launch_pads[0], gravity_objects, black_holes)
+    return run
+
+
+# Map generation
+
+@benchmark("create_gravity_objects")
+def _create_gravity_objects(seed):
+    _, black_holes, _, _ = _scene(seed)
+
+    def run():
+        random.seed(seed)
+        create_gravity_objects(black_holes)
+    return run
+
+
+@benchmark("create_black_holes")
+def _create_black_holes(seed):
+    _, _, _, launch_pads = _scene(seed)
+
+    def run():
+        random.seed(seed)
+        create_black_holes(launch_pads)
+    return run
+
+
+@benchmark("create_asteroids")
+def _create_asteroids(seed):
+    gravity_objects, black_holes, _, launch_pads = _scene(seed)
+
+    def run():
+        random.seed(seed)
+        create_asteroids(gravity_objects, black_holes, launch_pads)
+    return run
+
+
+@benchmark("place_asteroids_300", ops=300)
+def _place_asteroids(seed):
+    """A dense asteroid field on a 6000x4000 map, per asteroid"""
+    def run():
+        Placer().place('asteroid', 300, (0, 0, 6000, 4000), random.Random(seed))
+    return run
+
+
+# Drawing (offscreen, needs pygame)
+
+def _frame_scene(seed):
+    """A seeded map plus a shot in flight and one in the shot history"""
+    gravity_objects, black_holes, asteroids, launch_pads = _scene(seed)
+    missiles = _volley(launch_pads, 2, seed)
+    for _ in range(60):
+        for missile in missiles:
+            missile.update(gravity_objects, black_holes)
+    shot_history = [(0, [(simplify_trail(missiles[0].trail.to_list()), missiles[0].color)])]
+    return gravity_objects, black_holes, asteroids, launch_pads, missiles[1:], shot_history
+
+
+def _display():
+    import pygame
+    pygame.display.init()
+    pygame.font.init()
+    return pygame.display.set_mode((WIDTH, HEIGHT))
+
+
+@benchmark("draw_static_scene")
+def _draw_static_scene(seed):
+    import pygame
+    from render import draw_static_scene
+    _display()
+    surface = pygame.Surface((WIDTH, HEIGHT)).convert()
+    gravity_objects, black_holes, asteroids, _, _, shot_history = _frame_scene(seed)
+
+    def run():
+        draw_static_scene(surface, None, gravity_objects, black_holes, asteroids, shot_history)
+    return run
+
+
+@benchmark("draw_frame")
+def _draw_frame(seed):
+    """One full-screen frame as main.py draws it with the static layer already built"""
+    import pygame
+    from render import draw_launch_pad, draw_missile, draw_static_scene
+    from render_cache import get_font, render_text
+    screen = _display()
+    layer = pygame.Surface((WIDTH, HEIGHT)).convert()
+    gravity_objects, black_holes, asteroids, launch_pads, missiles, shot_history = _frame_scene(seed)
+    draw_static_scene(layer, None, gravity_objects, black_holes, asteroids, shot_history)
+    font_med = get_font(32)
+    font_small = get_font(24)
+
+    def run():
+        screen.blit(layer, (0, 0))
+        for missile in missiles:
+            draw_missile(screen, missile)
+        for i, pad in enumerate(launch_pads):
+            draw_launch_pad(screen, pad, i == 0)
+        turn_text = render_text(font_med, f"{launch_pads[0].name}'s Turn", launch_pads[0].color)
+        screen.blit(turn_text, (WIDTH//2 - turn_text.get_width()//2, 20))
+        controls_text = render_text(font_small, "CPU is thinking...", (255, 255, 0))
+        screen.blit(controls_text, (WIDTH//2 - controls_text.get_width()//2, 60))
+    return run
+
+
+@benchmark("draw_launch_pads", ops=100)
+def _draw_launch_pads(seed):
+    """Both saucers with cannon, power line, health bar and label, 100 frames"""
+    from render import draw_launch_pad
+    screen = _display()
+    launch_pads = _frame_scene(seed)[3]
+    # Sprites and labels are built once per game, not per frame
+    for pad in launch_pads:
+        draw_launch_pad(screen, pad, True)
+
+    def run():
+        for _ in range(100):
+            for i, pad in enumerate(launch_pads):
+                draw_launch_pad(screen, pad, i == 0)
+    return run
+
+
+def run_benchmark(name, repeat, seed=SEED):
+    """Time one benchmark repeat times (fresh setup each time) and summarize"""
+    setup, ops = BENCHMARKS[name]
+    times = []
+    for _ in range(repeat):
+        run = setup(seed)
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return {
+        "repeat": repeat,
+        "ops": ops,
+        "min_s": min(times),
+        "median_s": statistics.median(times),
+        "per_op_us": min(times) / ops * 1e6,
+    }
+
+
+def run_all(names, repeat, seed=SEED):
+    results = {}
+    for name in names:
+        try:
+            results[name] = run_benchmark(name, repeat, seed)
+        except ImportError as error:
+            # Drawing benchmarks need pygame and swarm_update_50 NumPy; the rest only need the core
+            print(f"skipping {name}: {error}", file=sys.stderr)
+    return {
+        "seed": seed,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+
+def compare(report, baseline, threshold):
+    """Benchmarks more than threshold slower than the baseline.
+
+    Compares the fastest repeat, which is the least affected by other load.
+    """
+    regressions = []
+    for name, result in report["results"].items():
+        old = baseline["results"].get(name)
+        if old is None:
+            continue
+        change = result["min_s"] / old["min_s"] - 1
+        result["change"] = change
+        if change > threshold:
+            regressions.append((name, change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Gravity Missiles hot paths")
+    parser.add_argument("names", nargs="*", help="benchmarks to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=15)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--out", help="write the JSON results here (e.g. to save a baseline)")
+    parser.add_argument("--baseline", help="JSON results from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="fail when a benchmark is this fraction slower than the baseline")
+    parser.add_argument("--list", action="store_true", help="list the benchmarks and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        return 0
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    # Draw offscreen without opening a window
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+    report = run_all(args.names or list(BENCHMARKS), args.repeat, args.seed)
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+
+    for name, result in report["results"].items():
+        change = result.get("change")
+        change = f"{change:+7.1%}" if change is not None else ""
+        print(f"{name:24} {result['min_s'] * 1e3:10.3f} ms {result['per_op_us']:12.2f} us/op {change}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    for name, change in regressions:
+        print(f"REGRESSION {name}: {change:+.1%} (threshold {args.threshold:.0%})", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
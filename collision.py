@@ -0,0 +1,41 @@
+"""Uniform-grid broad phase for missile collision checks.
+
+Missiles are points and the things they hit are circles, so each circle is
+filed under every grid cell its bounding box touches and a missile only
+tests the circles filed under its own cell. Lookups cost the same however
+many asteroids are on the map; the exact test stays a squared distance.
+"""
+
+
+class SpatialHash:
+    """Circles bucketed by grid cell.
+
+    Each bucket keeps its circles in insertion order, so query() returns
+    candidates in the same order as the original list and "first hit wins"
+    rules behave exactly as with a plain loop.
+    """
+
+    def __init__(self, cell=100):
+        self.cell = cell
+        self.buckets = {}
+
+    def insert(self, obj, x, y, radius):
+        cell = self.cell
+        for i in range(int((x - radius) // cell), int((x + radius) // cell) + 1):
+            for j in range(int((y - radius) // cell), int((y + radius) // cell) + 1):
+                self.buckets.setdefault((i, j), []).append(obj)
+
+    def query(self, x, y):
+        """Objects whose bounding box may contain the point (x, y)"""
+        return self.buckets.get((int(x // self.cell), int(y // self.cell)), ())
+
+    def clear(self):
+        self.buckets.clear()
+
+
+def asteroid_index(asteroids, cell=100):
+    """SpatialHash of the asteroids, in list order"""
+    index = SpatialHash(cell)
+    for asteroid in asteroids:
+        index.insert(asteroid, asteroid.x, asteroid.y, asteroid.radius)
+    return index
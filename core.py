@@ -0,0 +1,1081 @@
+"""Gravity Missiles game rules: bodies, missiles, launch pads, the CPU player,
+map generation and turn logic.
+
+Nothing here touches pygame (drawing lives in render.py) and NumPy is only
+imported when a batched code path is first used, so the core imports
+instantly and can simulate shots in tests, tools or a server process.
+"""
+import itertools
+import math
+import random
+import time
+from array import array
+
+from collision import asteroid_index
+from placement import PlacementError, Placer
+
+WIDTH, HEIGHT = 1400, 800
+
+# Colors
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+RED = (220, 50, 50)
+BLUE = (50, 100, 220)
+YELLOW = (255, 220, 50)
+GRAY = (150, 150, 150)
+PURPLE = (180, 100, 200)
+ORANGE = (255, 150, 50)
+GREEN = (50, 200, 50)
+
+TRAIL_LENGTH = 100  # Points kept in a missile trail
+HISTORY_TOLERANCE = 0.75  # Pixels a stored shot trail may stray from the flown one
+
+# Below this many missiles in flight the plain per-missile update is cheaper
+SWARM_MIN_MISSILES = 8
+
+# Independent random streams of a match (see MatchRandom)
+RNG_STREAMS = ("map", "asteroids", "debris", "pads", "cpu")
+
+# Player inputs as Match.press() takes them and replays store them, named
+# after the keys that send them
+KEY_LEFT, KEY_RIGHT, KEY_UP, KEY_DOWN, KEY_SPACE, KEY_SHIFT, KEY_P = range(7)
+
+# "classic": 3 planets and a black hole. The others fill the sky with hundreds
+# of small gravitating rocks (use a Barnes-Hut tree or acceleration field as
+# the `field` to keep them cheap)
+MAP_MODES = ("classic", "asteroid_belt", "galaxy")
+
+
+class TrailBuffer:
+    """Fixed-capacity ring buffer of trail points (oldest first when read)
+
+    Appending once full overwrites the oldest point in O(1), instead of the
+    O(n) list.pop(0) a plain list needs.
+    """
+
+    __slots__ = ('capacity', 'points', 'start')
+
+    def __init__(self, capacity=TRAIL_LENGTH):
+        self.capacity = capacity
+        self.points = []
+        self.start = 0  # Index of the oldest point once the buffer is full
+
+    def append(self, point):
+        if len(self.points) < self.capacity:
+            self.points.append(point)
+        else:
+            self.points[self.start] = point
+            self.start = (self.start + 1) % self.capacity
+
+    def to_list(self):
+        """Points in order, oldest first"""
+        if self.start == 0:
+            return self.points[:]
+        return self.points[self.start:] + self.points[:self.start]
+
+    def clear(self):
+        # Keep the list so a recycled missile doesn't allocate a new one
+        self.points.clear()
+        self.start = 0
+
+    def __len__(self):
+        return len(self.points)
+
+    def __iter__(self):
+        return iter(self.to_list())
+
+def simplify_trail(points, tolerance=HISTORY_TOLERANCE):
+    """Ramer-Douglas-Peucker: the fewest of points (kept in order, ends included)
+    within tolerance of the polyline, flattened into array('f') x0, y0, x1, y1, ...
+
+    Missiles fly in smooth arcs, so a 100-point trail usually keeps a fifth
+    of its points.
+    """
+    n = len(points)
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    keep = [False] * n
+    if n:
+        keep[0] = keep[-1] = True
+    limit = tolerance * tolerance
+    stack = [(0, n - 1)] if n > 2 else []
+    while stack:
+        first, last = stack.pop()
+        x0 = xs[first]
+        y0 = ys[first]
+        dx = xs[last] - x0
+        dy = ys[last] - y0
+        # Squared distances to the chord segment, all scaled by its squared
+        # length so the inner loop needs no division: the cross product
+        # alongside the chord, the distance to the nearer end past either end
+        # (where a trail doubles back)
+        length_sq = dx*dx + dy*dy
+        worst = -1.0
+        worst_i = first
+        if length_sq:
+            x1 = xs[last]
+            y1 = ys[last]
+            for i in range(first + 1, last):
+                px = xs[i] - x0
+                py = ys[i] - y0
+                along = px*dx + py*dy
+                if along < 0:
+                    dist = (px*px + py*py) * length_sq
+                elif along > length_sq:
+                    qx = xs[i] - x1
+                    qy = ys[i] - y1
+                    dist = (qx*qx + qy*qy) * length_sq
+                else:
+                    dist = px*dy - py*dx
+                    dist *= dist
+                if dist > worst:
+                    worst = dist
+                    worst_i = i
+            worst /= length_sq
+        else:
+            for i in range(first + 1, last):
+                px = xs[i] - x0
+                py = ys[i] - y0
+                dist_sq = px*px + py*py
+                if dist_sq > worst:
+                    worst = dist_sq
+                    worst_i = i
+        if worst > limit:
+            keep[worst_i] = True
+            if worst_i - first > 1:
+                stack.append((first, worst_i))
+            if last - worst_i > 1:
+                stack.append((worst_i, last))
+
+    flat = array('f')
+    for i in range(n):
+        if keep[i]:
+            flat.append(xs[i])
+            flat.append(ys[i])
+    return flat
+
+class GravityObject:
+    __slots__ = ('x', 'y', 'mass', 'radius', 'planet_type')
+
+    def __init__(self, x, y, mass, planet_type=None, rng=random):
+        self.x = x
+        self.y = y
+        self.mass = mass
+        if planet_type == 'rock':
+            # Belt and galaxy rocks are small and light
+            self.radius = max(3, min(7, mass / 8))
+            self.planet_type = planet_type
+            return
+        self.radius = max(15, min(40, mass / 50))
+        
+        # Assign a random planet type
+        planet_types = ['mars', 'jupiter', 'saturn', 'neptune', 'uranus', 'venus']
+        self.planet_type = planet_type or rng.choice(planet_types)
+
+    def get_gravity_force(self, x, y):
+        dx = self.x - x
+        dy = self.y - y
+        dist_sq = dx*dx + dy*dy + 1  # +1 to avoid division by zero
+        dist = math.sqrt(dist_sq)
+        
+        # Gravitational force: F = G * m1 * m2 / r^2
+        G = 1.0  # Gravitational constant (scaled for gameplay)
+        force = G * self.mass / dist_sq
+        
+        # Return force components
+        if dist > 0:
+            return (force * dx / dist, force * dy / dist)
+        return (0, 0)
+
+class BlackHole:
+    __slots__ = ('x', 'y', 'mass', 'event_horizon', 'radius')
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+        self.mass = 8000  # Much stronger than regular gravity objects
+        self.event_horizon = 35  # Point of no return
+        self.radius = 20
+        
+    def get_gravity_force(self, x, y):
+        dx = self.x - x
+        dy = self.y - y
+        dist_sq = dx*dx + dy*dy + 1
+        dist = math.sqrt(dist_sq)
+        
+        # Much stronger gravitational constant for black holes
+        G = 5.0
+        force = G * self.mass / dist_sq
+        
+        if dist > 0:
+            return (force * dx / dist, force * dy / dist)
+        return (0, 0)
+    
+    def check_captured(self, missile_x, missile_y):
+        """Check if missile has crossed the event horizon"""
+        dx = missile_x - self.x
+        dy = missile_y - self.y
+        return dx*dx + dy*dy < self.event_horizon * self.event_horizon
+
+class Asteroid:
+    __slots__ = ('x', 'y', 'radius', 'color', 'destroyed', 'num_points', 'shape_points')
+
+    def __init__(self, x, y, rng=random):
+        self.x = x
+        self.y = y
+        self.radius = rng.randint(25, 45)
+        self.color = (150, 150, 150)
+        self.destroyed = False
+        
+        # Generate random shape points
+        self.num_points = rng.randint(8, 12)
+        self.shape_points = []
+        for i in range(self.num_points):
+            angle = (2 * math.pi * i) / self.num_points
+            # Randomize radius for each point to make irregular shape
+            point_radius = self.radius * rng.uniform(0.7, 1.0)
+            point_x = self.x + math.cos(angle) * point_radius
+            point_y = self.y + math.sin(angle) * point_radius
+            self.shape_points.append((point_x, point_y))
+        
+    def check_collision(self, missile_x, missile_y):
+        if not self.destroyed:
+            dx = missile_x - self.x
+            dy = missile_y - self.y
+            return dx*dx + dy*dy < self.radius * self.radius
+        return False
+    
+    def explode(self, missile_vx, missile_vy, rng=random):
+        """Create multiple missiles firing in all directions"""
+        self.destroyed = True
+        fragments = []
+        num_fragments = rng.randint(10, 15)
+        
+        for i in range(num_fragments):
+            vx = missile_vx + rng.uniform(-10, 10)
+            vy = missile_vy + rng.uniform(-10, 10)
+            fragment = missile_pool.acquire(self.x, self.y, vx, vy, GRAY)
+            fragments.append(fragment)
+        
+        return fragments
+
+class Missile:
+    __slots__ = ('x', 'y', 'vx', 'vy', 'color', 'active', 'trail', 'fuel', 'thrust_cooldown',
+                 'pooled', 'accel')
+
+    def __init__(self, x, y, vx, vy, color):
+        self.trail = TrailBuffer()
+        self.pooled = False  # Sitting in a MissilePool's free list
+        self.reset(x, y, vx, vy, color)
+
+    def reset(self, x, y, vx, vy, color):
+        """Make this a fresh missile (used when a pooled one is recycled)"""
+        self.x = x
+        self.y = y
+        self.vx = vx
+        self.vy = vy
+        self.color = color
+        self.active = True
+        self.trail.clear()
+        self.fuel = 20  # Number of thrusts available
+        self.thrust_cooldown = 0
+        self.accel = None  # Integrator's acceleration at (x, y), carried to the next frame
+        
+    def apply_thrust(self):
+        if self.fuel > 0 and self.thrust_cooldown <= 0:
+            # Apply thrust in current direction of movement
+            speed = math.sqrt(self.vx**2 + self.vy**2)
+            if speed > 0:
+                thrust_amount = 5.0
+                self.vx += (self.vx / speed) * thrust_amount
+                self.vy += (self.vy / speed) * thrust_amount
+                self.fuel -= 1
+                self.thrust_cooldown = 10  # Cooldown frames
+                return True
+        return False
+
+    def apply_reverse_thrust(self):
+        if self.fuel > 0 and self.thrust_cooldown <= 0:
+            # Apply thrust in opposite direction of movement
+            speed = math.sqrt(self.vx**2 + self.vy**2)
+            if speed > 0:
+                thrust_amount = 5.0
+                self.vx -= (self.vx / speed) * thrust_amount
+                self.vy -= (self.vy / speed) * thrust_amount
+                self.fuel -= 1
+                self.thrust_cooldown = 10  # Cooldown frames
+                return True
+        return False
+    
+    def apply_left_thrust(self):
+        if self.fuel > 0 and self.thrust_cooldown <= 0:
+            # Apply thrust perpendicular to current direction (left)
+            speed = math.sqrt(self.vx**2 + self.vy**2)
+            if speed > 0:
+                thrust_amount = 5.0
+                # Rotate velocity vector 90 degrees counter-clockwise
+                perp_x = -self.vy / speed
+                perp_y = self.vx / speed
+                self.vx += perp_x * thrust_amount
+                self.vy += perp_y * thrust_amount
+                self.fuel -= 1
+                self.thrust_cooldown = 10
+                return True
+        return False
+    
+    def apply_right_thrust(self):
+        if self.fuel > 0 and self.thrust_cooldown <= 0:
+            # Apply thrust perpendicular to current direction (right)
+            speed = math.sqrt(self.vx**2 + self.vy**2)
+            if speed > 0:
+                thrust_amount = 5.0
+                # Rotate velocity vector 90 degrees clockwise
+                perp_x = self.vy / speed
+                perp_y = -self.vx / speed
+                self.vx += perp_x * thrust_amount
+                self.vy += perp_y * thrust_amount
+                self.fuel -= 1
+                self.thrust_cooldown = 10
+                return True
+        return False
+        
+    def update(self, gravity_objects, black_holes, field=None, integrator=None):
+        if not self.active:
+            return
+        
+        if self.thrust_cooldown > 0:
+            self.thrust_cooldown -= 1
+
+        if integrator:
+            # Higher-order / substepped flight (see integrators.py)
+            state = integrator.step(self.x, self.y, self.vx, self.vy,
+                                    gravity_objects, black_holes, field, a=self.accel)
+            if state is None:
+                self.active = False
+                return
+            self.x, self.y, self.vx, self.vy, self.accel = state
+        else:
+            if field:
+                # Cached acceleration field replaces the per-body sums
+                fx, fy = field.sample(self.x, self.y)
+                self.vx += fx
+                self.vy += fy
+            else:
+                # Apply gravity from all objects
+                for obj in gravity_objects:
+                    fx, fy = obj.get_gravity_force(self.x, self.y)
+                    self.vx += fx
+                    self.vy += fy
+            
+            # Apply gravity from black holes (much stronger)
+            for bh in black_holes:
+                if not field:
+                    fx, fy = bh.get_gravity_force(self.x, self.y)
+                    self.vx += fx
+                    self.vy += fy
+                
+                # Check if captured by black hole
+                if bh.check_captured(self.x, self.y):
+                    self.active = False
+                    return
+            
+            # Update position
+            self.x += self.vx
+            self.y += self.vy
+        
+        # Add to trail (the ring buffer drops the oldest point once full)
+        self.trail.append((int(self.x), int(self.y)))
+        
+        # Check boundaries
+        if self.x < 0 or self.x > WIDTH or self.y < 0 or self.y > HEIGHT:
+            self.active = False
+
+class MissilePool:
+    """Recycles Missile objects (and their trail buffers) between turns.
+
+    Shots and fragments are acquired here and Match releases every missile
+    of a turn once its trails are saved, so a long session stops allocating
+    missiles after the first big explosion. created counts missiles built
+    from scratch and reused those handed out again; steady-state play should
+    only move reused.
+    """
+
+    def __init__(self, max_free=1024):
+        self.max_free = max_free
+        self.free = []
+        self.created = 0
+        self.reused = 0
+        self.released = 0
+
+    def acquire(self, x, y, vx, vy, color):
+        if self.free:
+            missile = self.free.pop()
+            missile.pooled = False
+            missile.reset(x, y, vx, vy, color)
+            self.reused += 1
+            return missile
+        self.created += 1
+        return Missile(x, y, vx, vy, color)
+
+    def release(self, missiles):
+        """Take back missiles nobody will use again"""
+        for missile in missiles:
+            if missile.pooled or len(self.free) >= self.max_free:
+                continue
+            missile.pooled = True
+            missile.active = False
+            self.free.append(missile)
+            self.released += 1
+
+    def stats(self):
+        return {'created': self.created, 'reused': self.reused,
+                'released': self.released, 'free': len(self.free)}
+
+
+missile_pool = MissilePool()
+
+class LaunchPad:
+    __slots__ = ('x', 'y', 'color', 'name', 'angle', 'power', 'health', 'is_cpu', 'destroyed')
+
+    def __init__(self, x, y, color, name, is_cpu=False):
+        self.x = x
+        self.y = y
+        self.color = color
+        self.name = name
+        self.angle = -45 if x < WIDTH/2 else -135
+        self.power = 10
+        self.health = 100
+        self.is_cpu = is_cpu
+        self.destroyed = False
+        
+    def fire(self):
+        angle_rad = math.radians(self.angle)
+        vx = math.cos(angle_rad) * self.power
+        vy = math.sin(angle_rad) * self.power
+        
+        # Start missile from end of cannon
+        start_x = self.x + math.cos(angle_rad) * 35
+        start_y = self.y + math.sin(angle_rad) * 35
+        
+        return missile_pool.acquire(start_x, start_y, vx, vy, self.color)
+    
+    def take_damage(self, damage):
+        self.health -= damage
+        if self.health <= 0:
+            self.destroyed = True
+        return self.health <= 0
+
+    def explode(self, missile_vx, missile_vy, rng=random):
+        """Create multiple missiles firing in all directions when destroyed"""
+        fragments = []
+        num_fragments = rng.randint(15, 20)
+        
+        for i in range(num_fragments):
+            vx = missile_vx + rng.uniform(-15, 15)
+            vy = missile_vy + rng.uniform(-15, 15)
+            fragment = missile_pool.acquire(self.x, self.y, vx, vy, self.color)
+            fragments.append(fragment)
+        
+        return fragments
+
+class CPUPlayer:
+    def __init__(self, difficulty, search_pool=None, rng=random, map_id=None):
+        self.difficulty = difficulty  # "easy", "medium", "hard"
+        # The Match's map_id; hard searches reuse paths cached for it across turns
+        self.map_id = map_id
+        self.rng = rng  # For the deliberate aiming errors
+        self.aim_timer = 0
+        self.aim_duration = 60  # frames to "think" before shooting
+        self.has_aimed = False
+        # Hard mode shots simulated per decision (see physics.ShotSearch)
+        self.search_budget = 480
+        self.search = None  # Hard search in progress, run a slice of each thinking frame
+        self.search_frame_time = 0.004  # Seconds of search per thinking frame
+        # Optional ParallelAimSearch that runs the hard search off the render thread
+        self.search_pool = search_pool if difficulty == "hard" else None
+        # Shots simulated over all decisions, for tuning the budget
+        self.simulations = 0
+        if difficulty == "hard" and not self.search_pool:
+            # Imported with the match rather than on the first thinking frame
+            import physics  # noqa: F401
+        
+    def reset_aim(self):
+        self.aim_timer = 0
+        self.has_aimed = False
+        self.search = None
+
+    def cancel(self):
+        """Drop any search in progress (turn skipped, reset or back to menu)"""
+        if self.search_pool:
+            self.search_pool.cancel()
+        self.reset_aim()
+        
+    def update(self, cpu_pad, target_pad, gravity_objects, black_holes, field=None):
+        """Update CPU AI and return True when ready to fire"""
+        if not self.has_aimed:
+            if self.difficulty == "hard" and self.aim_timer == 0:
+                # Think while the timer runs: in the pool, or a slice of each frame here
+                if self.search_pool:
+                    self.search_pool.start(cpu_pad, target_pad, gravity_objects, black_holes,
+                                           self.search_budget, WIDTH, HEIGHT, self.map_id, field)
+                else:
+                    self.start_search(cpu_pad, target_pad, gravity_objects, black_holes, field)
+            if self.search:
+                self.search.step(time.perf_counter() + self.search_frame_time)
+            self.aim_timer += 1
+            
+            if self.aim_timer >= self.aim_duration:
+                if self.search_pool:
+                    if not self.search_pool.done():
+                        return False  # Keep thinking
+                    best = self.search_pool.result()
+                    if best is None:
+                        self.aim(cpu_pad, target_pad, gravity_objects, black_holes, field)
+                    else:
+                        self.simulations += self.search_pool.simulations
+                        self.apply_best_shot(cpu_pad, *best)
+                else:
+                    self.aim(cpu_pad, target_pad, gravity_objects, black_holes, field)
+                self.has_aimed = True
+                return True
+        return False
+
+    def start_search(self, cpu_pad, target_pad, gravity_objects, black_holes, field=None):
+        """Begin the hard mode search for the shot closest to target_pad"""
+        from physics import ShotSearch
+        # Paths flown through the field and through exact gravity differ slightly
+        map_key = None if self.map_id is None else (self.map_id, field is None)
+        self.search = ShotSearch(cpu_pad.x, cpu_pad.y, target_pad.x, target_pad.y,
+                                 gravity_objects, black_holes, WIDTH, HEIGHT,
+                                 budget=self.search_budget, field=field, map_key=map_key)
+        return self.search
+
+    def apply_best_shot(self, cpu_pad, best_angle, best_power):
+        # little randomness to avoid perfect shots
+        cpu_pad.angle = best_angle + self.rng.uniform(-.025, .025)
+        cpu_pad.power = best_power + self.rng.uniform(-.05, .05)
+    
+    def aim(self, cpu_pad, target_pad, gravity_objects, black_holes, field=None):
+        """Calculate angle and power to hit target"""
+        dx = target_pad.x - cpu_pad.x
+        dy = target_pad.y - cpu_pad.y
+        distance = math.sqrt(dx**2 + dy**2)
+        
+        if self.difficulty == "easy":
+            # Easy: Aim roughly at opponent with large randomness
+            base_angle = math.degrees(math.atan2(dy, dx))
+            cpu_pad.angle = base_angle + self.rng.uniform(-30, 30)
+            cpu_pad.power = self.rng.randint(8, 16)
+            
+        elif self.difficulty == "medium":
+            # Medium: Better aim, considers distance
+            base_angle = math.degrees(math.atan2(dy, dx))
+            cpu_pad.angle = base_angle + self.rng.uniform(-15, 15)
+            
+            # Adjust power based on distance
+            power = distance / 80
+            power = max(8, min(18, power))
+            cpu_pad.power = power + self.rng.uniform(-2, 2)
+            
+        elif self.difficulty == "hard":
+            # Hard: coarse sweep then local refinement (finishing what update() started)
+            search = self.search or self.start_search(cpu_pad, target_pad, gravity_objects,
+                                                      black_holes, field)
+            while not search.done:
+                search.step()
+            self.search = None
+            self.simulations += search.simulations
+            _, angle, power = search.result()
+            self.apply_best_shot(cpu_pad, angle, power)
+
+    def simulate_shot(self, cpu_pad, target_pad, angle, power, gravity_objects, black_holes, field=None,
+                      integrator=None):
+        """Simulate a shot and return distance to target (lower is better)"""
+        angle_rad = math.radians(angle)
+        x = cpu_pad.x + math.cos(angle_rad) * 35
+        y = cpu_pad.y + math.sin(angle_rad) * 35
+        vx = math.cos(angle_rad) * power
+        vy = math.sin(angle_rad) * power
+        
+        min_dist = float('inf')
+        a = None
+        
+        # Simulate for limited steps
+        for step in range(200):
+            if integrator:
+                state = integrator.step(x, y, vx, vy, gravity_objects, black_holes, field, a=a)
+                if state is None:
+                    return float('inf')  # Captured
+                x, y, vx, vy, a = state
+            else:
+                # Apply gravity
+                if field:
+                    fx, fy = field.sample(x, y)
+                    vx += fx
+                    vy += fy
+                else:
+                    for obj in gravity_objects:
+                        fx, fy = obj.get_gravity_force(x, y)
+                        vx += fx
+                        vy += fy
+                
+                for bh in black_holes:
+                    if not field:
+                        fx, fy = bh.get_gravity_force(x, y)
+                        vx += fx
+                        vy += fy
+                    
+                    # Check if captured
+                    if bh.check_captured(x, y):
+                        return float('inf')  # Bad shot
+                
+                # Update position
+                x += vx
+                y += vy
+            
+            # Check distance to target
+            dist = math.sqrt((x - target_pad.x)**2 + (y - target_pad.y)**2)
+            min_dist = min(min_dist, dist)
+            
+            # If very close, this is a good shot
+            if dist < 30:
+                return dist
+            
+            # Check boundaries
+            if x < 0 or x > WIDTH or y < 0 or y > HEIGHT:
+                break
+        
+        return min_dist
+
+# Game setup functions
+def create_black_holes(launch_pads, num_black_holes=1, rng=random):
+    # Black holes go down first: they need the most room (see placement.SEPARATIONS)
+    placer = Placer()
+    placer.add_objects(launch_pads, 'pad')
+    region = (int(WIDTH * 0.3), 250, int(WIDTH * 0.7), HEIGHT - 250)
+    return [BlackHole(x, y) for x, y in placer.place('black_hole', num_black_holes, region, rng)]
+
+def create_gravity_objects(black_holes=(), num_objects=3, rng=random):
+    # Planets should be far from each other and even further from black holes
+    placer = Placer()
+    placer.add_objects(black_holes, 'black_hole')
+    objects = []
+    for x, y in placer.place('planet', num_objects, (300, 250, WIDTH - 300, HEIGHT - 250), rng):
+        mass = rng.randint(1000, 3000)
+        objects.append(GravityObject(x, y, mass, rng=rng))
+    
+    return objects
+
+def create_rocks(black_holes, gravity_objects, launch_pads, mode, rng=random):
+    """The many small gravitating bodies of the asteroid_belt and galaxy maps"""
+    if mode == "classic":
+        return []
+    placer = Placer()
+    placer.add_objects(launch_pads, 'pad')
+    placer.add_objects(black_holes, 'black_hole')
+    placer.add_objects(gravity_objects, 'planet')
+    cx, cy = WIDTH / 2, HEIGHT / 2
+
+    if mode == "asteroid_belt":
+        # A ring between the pads
+        count, masses, reach = 180, (20, 60), 370
+        def inside(x, y):
+            return 240 <= math.hypot(x - cx, y - cy) <= reach
+    elif mode == "galaxy":
+        # Two logarithmic spiral arms around the central black hole
+        count, masses, reach = 240, (15, 45), 390
+        def inside(x, y):
+            r = math.hypot(x - cx, y - cy)
+            if not 110 <= r <= reach:
+                return False
+            phase = (math.atan2(y - cy, x - cx) - math.log(r / 110) / 0.35) % math.pi
+            return min(phase, math.pi - phase) < 0.75
+    else:
+        raise ValueError(f"unknown map mode {mode!r}, expected one of {MAP_MODES}")
+
+    positions = placer.place('rock', count, (cx - reach, cy - reach, cx + reach, cy + reach), rng,
+                             inside=inside)
+    return [GravityObject(x, y, rng.randint(*masses), 'rock') for x, y in positions]
+
+def _add_bodies(placer, gravity_objects):
+    for obj in gravity_objects:
+        placer.add(obj.x, obj.y, 'rock' if obj.planet_type == 'rock' else 'planet')
+
+def create_asteroids(gravity_objects, black_holes, launch_pads, num_asteroids=1, rng=random):
+    # Asteroids keep their distance from everything
+    placer = Placer()
+    placer.add_objects(launch_pads, 'pad')
+    _add_bodies(placer, gravity_objects)
+    placer.add_objects(black_holes, 'black_hole')
+    region = (int(WIDTH * 0.2), 150, int(WIDTH * 0.8), HEIGHT - 150)
+    return [Asteroid(x, y, rng) for x, y in placer.place('asteroid', num_asteroids, region, rng)]
+
+def create_map(launch_pads, mode="classic", attempts=20, rng=random):
+    """Planets (and rocks), black holes and asteroids around the pads, as three lists.
+
+    Now and then a black hole leaves no room for three planets, so the whole
+    map is rerolled; PlacementError only escapes if every attempt fails.
+    """
+    for attempt in range(attempts):
+        try:
+            if mode == "galaxy":
+                # The galaxy turns around a black hole in the middle
+                black_holes = [BlackHole(WIDTH // 2, HEIGHT // 2)]
+                gravity_objects = []
+            else:
+                black_holes = create_black_holes(launch_pads, rng=rng)
+                gravity_objects = create_gravity_objects(black_holes,
+                                                         2 if mode == "asteroid_belt" else 3, rng)
+            gravity_objects += create_rocks(black_holes, gravity_objects, launch_pads, mode, rng)
+            asteroids = create_asteroids(gravity_objects, black_holes, launch_pads, rng=rng)
+            return gravity_objects, black_holes, asteroids
+        except PlacementError:
+            if attempt == attempts - 1:
+                raise
+
+def create_launch_pads(is_cpu=False, cpu_difficulty=None, rng=random):
+    # Place first pad in left 10% of screen
+    margin = 50
+    x1 = rng.randint(margin, int(WIDTH * 0.1))
+    y1 = rng.randint(margin, HEIGHT - margin)
+    
+    # Place second pad in right 10% of screen
+    x2 = rng.randint(int(WIDTH * 0.9), WIDTH - margin)
+    y2 = rng.randint(margin, HEIGHT - margin)
+    
+    # Calculate initial angles to point roughly at each other
+    angle1 = math.degrees(math.atan2(y2 - y1, x2 - x1))
+    angle2 = math.degrees(math.atan2(y1 - y2, x1 - x2))
+    
+    player1 = LaunchPad(x1, y1, RED, "Player 1")
+    
+    if is_cpu:
+        player2 = LaunchPad(x2, y2, BLUE, f"CPU ({cpu_difficulty.capitalize()})", is_cpu=True)
+    else:
+        player2 = LaunchPad(x2, y2, BLUE, "Player 2")
+    
+    player1.angle = angle1
+    player2.angle = angle2
+    
+    return player1, player2
+
+def relocate_pad(players, i, rng=random):
+    """Move a pad that survived a hit somewhere new on its own side"""
+    player = players[i]
+    margin = 50
+    if i == 0:  # Player 1 - left 10%
+        player.x = rng.randint(margin, int(WIDTH * 0.1))
+    else:  # Player 2 - right 10%
+        player.x = rng.randint(int(WIDTH * 0.9), WIDTH - margin)
+    player.y = rng.randint(margin, HEIGHT - margin)
+    
+    # Reorient cannon toward opponent
+    other_player = players[1-i]
+    player.angle = math.degrees(math.atan2(other_player.y - player.y, other_player.x - player.x))
+
+# Every Match gets a new map_id, for caches keyed on the map
+_map_ids = itertools.count(1)
+
+
+class MatchRandom:
+    """The seeded random streams of one match, one per use (see RNG_STREAMS).
+
+    Keeping them apart means e.g. the CPU's aiming error doesn't shift the
+    debris of the next explosion, so a replay that skips the CPU search
+    still rebuilds the same asteroids and fragments.
+    """
+
+    __slots__ = ('seed',) + RNG_STREAMS
+
+    def __init__(self, seed):
+        self.seed = seed
+        for name in RNG_STREAMS:
+            # String seeds hash the same way on every run and platform
+            setattr(self, name, random.Random(f"{seed}:{name}"))
+
+
+class Match:
+    """One game in progress: the map, both pads, missiles in flight and the turn rules.
+
+    The window and headless runs drive the same object. Input comes in
+    through press(), drag() and shot() (or end_turn() and thrusts on
+    active_missile directly), and update() advances one frame. Anything
+    worth a sound effect is appended to events as (name, x, y) for the front
+    end to drain.
+
+    All randomness comes from the seed, and the inputs are kept in inputs as
+    (frame, op, args) tuples, so the seed and inputs replay the match (see
+    replay.py).
+    """
+
+    def __init__(self, is_cpu=False, cpu_difficulty=None, search_pool=None, integrator=None,
+                 map_mode="classic", seed=None):
+        self.is_cpu = is_cpu
+        self.cpu_difficulty = cpu_difficulty
+        self.map_mode = map_mode
+        self.integrator = integrator  # None steps missiles with the classic per-frame Euler
+        if seed is None:
+            seed = random.getrandbits(64)
+        self.seed = seed
+        self.rng = MatchRandom(seed)
+        self.frame = 0  # update() calls so far
+        self.turn = 1
+        self.inputs = []
+        self.player1, self.player2 = create_launch_pads(is_cpu, cpu_difficulty, self.rng.pads)
+        self.players = [self.player1, self.player2]
+        self.gravity_objects, self.black_holes, self.asteroids = create_map(self.players, map_mode,
+                                                                           rng=self.rng.map)
+        self.map_id = next(_map_ids)
+        self.missiles = []  # Everything fired this turn (spent ones still show their trails)
+        self.flying = []  # The active ones, compacted every frame
+        self.shot_history = []
+        self.keep_history = True  # Headless runs that draw nothing turn this off
+        self.current_player = 0
+        self.winner = None
+        self.missile_fired = False
+        self.active_missile = None
+        self.events = []
+        self.swarm = None  # Created when a fragment shower first needs it
+        self.profiler = None  # Optional profiler.FrameProfiler told about each phase of update()
+        # Broad phase over self.asteroids, rebuilt whenever the list is replaced
+        self.asteroid_index = None
+        self.indexed_asteroids = None
+        
+        self.cpu_ai = None
+        if is_cpu:
+            self.cpu_ai = CPUPlayer(cpu_difficulty, search_pool=search_pool, rng=self.rng.cpu,
+                                    map_id=self.map_id)
+
+    @property
+    def current(self):
+        return self.players[self.current_player]
+
+    @property
+    def game_over(self):
+        return self.winner is not None
+
+    def cancel(self):
+        """Stop background work (CPU search) and recycle missiles before the match is dropped"""
+        if self.cpu_ai:
+            self.cpu_ai.cancel()
+        missile_pool.release(self.missiles)
+        self.missiles = []
+        self.flying = []
+        self.active_missile = None
+
+    def press(self, key):
+        """One key press by the player whose turn it is (KEY_* constants).
+
+        Before firing the arrows aim and space fires; with a missile in
+        flight they steer it. P ends the turn.
+        """
+        self.inputs.append((self.frame, 'press', (key,)))
+        current = self.current
+        if key == KEY_P:
+            self.end_turn()
+        elif current.is_cpu:
+            return
+        elif not self.missile_fired:
+            if key == KEY_LEFT:
+                current.angle -= .5
+            elif key == KEY_RIGHT:
+                current.angle += .5
+            elif key == KEY_UP:
+                current.power = min(20, current.power + .5)
+            elif key == KEY_DOWN:
+                current.power = max(3, current.power - .5)
+            elif key == KEY_SPACE:
+                self.fire()
+        elif self.active_missile and self.active_missile.active:
+            missile = self.active_missile
+            if key == KEY_SPACE or key == KEY_UP:
+                missile.apply_thrust()
+            elif key == KEY_DOWN or key == KEY_SHIFT:
+                missile.apply_reverse_thrust()
+            elif key == KEY_RIGHT:
+                missile.apply_left_thrust()
+            elif key == KEY_LEFT:
+                missile.apply_right_thrust()
+
+    def drag(self, x, y):
+        """Aim the current pad at the (integer) mouse position x, y"""
+        self.inputs.append((self.frame, 'drag', (x, y)))
+        current = self.current
+        if current.is_cpu or self.missile_fired:
+            return
+        dx = x - current.x
+        dy = y - current.y
+        current.angle = math.degrees(math.atan2(dy, dx))
+        # Power grows with distance, capped between 3 and 20
+        current.power = max(3, min(20, math.sqrt(dx**2 + dy**2) / 10))
+
+    def shot(self, angle, power):
+        """Fire the current pad at exactly this angle and power (how CPU shots are recorded)"""
+        self.inputs.append((self.frame, 'shot', (angle, power)))
+        self.current.angle = angle
+        self.current.power = power
+        return self.fire()
+
+    def fire(self):
+        missile = self.current.fire()
+        self.missiles.append(missile)
+        self.flying.append(missile)
+        self.missile_fired = True
+        self.active_missile = missile
+        self.events.append(('fire', missile.x, missile.y))
+        return missile
+
+    def end_turn(self):
+        """End current turn and switch to next player (the P key)"""
+        if self.cpu_ai:
+            self.cpu_ai.cancel()
+        # Keep the cut-short shot's trails, then hand its missiles back
+        self._save_shot()
+        missile_pool.release(self.missiles)
+        self.missiles = []
+        self.flying = []
+        self.current_player = 1 - self.current_player
+        self.turn += 1
+        self.missile_fired = False
+        self.active_missile = None
+        # Reset asteroids for next turn
+        self.asteroids = create_asteroids(self.gravity_objects, self.black_holes, self.players,
+                                          rng=self.rng.asteroids)
+        # Reset CPU AI if switching to CPU
+        if self.cpu_ai and self.current.is_cpu:
+            self.cpu_ai.reset_aim()
+
+    def update(self, field=None):
+        """Advance one frame: CPU thinking, missile flight, hits and turn switching"""
+        profiler = self.profiler
+        # CPU AI logic (only while nobody has won)
+        if not self.game_over and self.cpu_ai and self.current.is_cpu and not self.missile_fired:
+            if profiler:
+                profiler.switch('cpu')
+            if self.cpu_ai.update(self.current, self.players[1 - self.current_player],
+                                  self.gravity_objects, self.black_holes, field):
+                # CPU is ready to fire
+                self.shot(self.current.angle, self.current.power)
+                self.cpu_ai.reset_aim()
+        
+        # Update missiles (continue even after the game is over)
+        if self.missile_fired:
+            # Drop the missiles that stopped last frame
+            self.flying = [missile for missile in self.flying if missile.active]
+            all_inactive = not self.flying
+
+            # Fragments spawned this frame get their first step in the next wave
+            pending = list(self.flying)
+            if profiler:
+                profiler.count_add('missiles', len(pending))
+            while pending:
+                if profiler:
+                    profiler.switch('physics')
+                    # Body pulls summed (or field lookups) for this wave
+                    bodies = 1 if field else len(self.gravity_objects) + len(self.black_holes)
+                    profiler.count_add('force_evals', len(pending) * bodies)
+                self.step_missiles(pending, field)
+                if profiler:
+                    profiler.switch('collisions')
+                spawned = []
+                for missile in pending:
+                    spawned.extend(self.check_collisions(missile))
+                self.missiles.extend(spawned)
+                self.flying.extend(spawned)
+                pending = spawned
+            
+            # Switch turns when all missiles are done
+            if all_inactive and not self.game_over:
+                if profiler:
+                    profiler.switch('next_turn')
+                self.next_turn()
+
+        self.frame += 1
+
+    def step_missiles(self, missiles, field=None):
+        # The batched swarm only does the classic Euler step
+        if len(missiles) >= SWARM_MIN_MISSILES and not self.integrator:
+            if self.swarm is None:
+                from physics import MissileSwarm
+                self.swarm = MissileSwarm(WIDTH, HEIGHT)
+            self.swarm.update(missiles, self.gravity_objects, self.black_holes, field)
+        else:
+            for missile in missiles:
+                missile.update(self.gravity_objects, self.black_holes, field, self.integrator)
+
+    def check_collisions(self, missile):
+        """Resolve asteroid and pad hits for one missile, returning any fragments"""
+        fragments = []
+
+        # Check collision with the asteroids near the missile
+        if self.indexed_asteroids is not self.asteroids:
+            self.asteroid_index = asteroid_index(self.asteroids)
+            self.indexed_asteroids = self.asteroids
+        for asteroid in self.asteroid_index.query(missile.x, missile.y):
+            if missile.active and asteroid.check_collision(missile.x, missile.y):
+                self.events.append(('explode', asteroid.x, asteroid.y))
+                missile.active = False
+                # Create fragment missiles from asteroid
+                fragments.extend(asteroid.explode(missile.vx, missile.vy, self.rng.debris))
+                break
+        
+        # Check collision with players (including friendly fire)
+        for i, player in enumerate(self.players):
+            if missile.active and not player.destroyed and not self.game_over:
+                dx = missile.x - player.x
+                dy = missile.y - player.y
+                if dx*dx + dy*dy < 25 * 25:
+                    self.events.append(('hit', player.x, player.y))
+                    missile.active = False
+                    if player.take_damage(20):
+                        # Player destroyed - create explosion
+                        self.events.append(('explode', player.x, player.y))
+                        fragments.extend(player.explode(missile.vx, missile.vy, self.rng.debris))
+                        self.winner = self.players[1-i]
+                    else:
+                        relocate_pad(self.players, i, self.rng.pads)
+
+        return fragments
+
+    def _save_shot(self):
+        """Save this shot's trails to the history, simplified into flat x, y
+        arrays (see simplify_trail)"""
+        shot_trails = []
+        if self.keep_history:
+            for missile in self.missiles:
+                if len(missile.trail) > 1:
+                    shot_trails.append((simplify_trail(missile.trail.to_list()), missile.color))
+        
+        if shot_trails:
+            # Store with player identifier
+            self.shot_history.append((self.current_player, shot_trails))
+            
+            # Keep only the last shot from each player (max 2 shots total)
+            # Remove older shots from the same player
+            player_shots = [i for i, (player_id, _) in enumerate(self.shot_history)
+                            if player_id == self.current_player]
+            if len(player_shots) > 1:
+                # Remove the oldest shot from this player
+                self.shot_history.pop(player_shots[0])
+
+    def next_turn(self):
+        self._save_shot()
+        self.current_player = 1 - self.current_player
+        self.turn += 1
+        self.missile_fired = False
+        self.active_missile = None
+        # Reset asteroids for next turn
+        self.asteroids = create_asteroids(self.gravity_objects, self.black_holes, self.players,
+                                          rng=self.rng.asteroids)
+        # Clear current missiles (their trails were copied to the history)
+        missile_pool.release(self.missiles)
+        self.missiles = []
+        self.flying = []
+        # Reset CPU AI if switching to CPU
+        if self.cpu_ai and self.current.is_cpu:
+            self.cpu_ai.reset_aim()
+
+def reset_game(is_cpu, cpu_difficulty, search_pool=None, integrator=None, map_mode="classic",
+               seed=None):
+    """Start a fresh match with a new map (a random one unless seed is given)"""
+    return Match(is_cpu, cpu_difficulty, search_pool, integrator, map_mode, seed)
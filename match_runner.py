@@ -0,0 +1,241 @@
+"""Headless CPU-vs-CPU matches for tuning difficulty.
+
+Plays complete matches with the real turn rules from core.Match (map from
+reset_game, asteroid fragments, take_damage and pad relocation, turn
+switching) but no window and no frame cap, spread across a process pool.
+
+    python match_runner.py hard medium --matches 2000 --workers 8 --out results.json
+
+With --replays DIR each match is also saved as a replay.py file, named by
+its seed, so an odd result can be watched afterwards.
+"""
+import argparse
+import concurrent.futures
+import csv
+import json
+import math
+import os
+import random
+import time
+
+from core import KEY_P, CPUPlayer, reset_game
+from replay import Replay
+
+PLAYER_KINDS = ("easy", "medium", "hard", "scripted")
+
+MAX_TURNS = 200  # Matches still undecided after this many shots are draws
+MAX_TURN_FRAMES = 3000  # A shot still flying after this long ends the turn (like P)
+
+# Columns of a play_match() result, in CSV order
+RESULT_FIELDS = ("seed", "player1", "player2", "winner", "turns", "shots1", "shots2",
+                 "hits1", "hits2", "sims1", "sims2", "frames")
+
+
+def scripted_aim(pad, target_pad, match):
+    """Straight-line shooter: point at the target with power scaled by distance"""
+    dx = target_pad.x - pad.x
+    dy = target_pad.y - pad.y
+    pad.angle = math.degrees(math.atan2(dy, dx))
+    pad.power = max(8, min(18, math.sqrt(dx**2 + dy**2) / 80))
+
+
+class Controller:
+    """Aims one pad: a CPUPlayer of some difficulty or the scripted shooter"""
+
+    def __init__(self, kind, map_id=None):
+        if kind not in PLAYER_KINDS:
+            raise ValueError(f"unknown player kind {kind!r}, expected one of {PLAYER_KINDS}")
+        self.kind = kind
+        self.cpu = CPUPlayer(kind, map_id=map_id) if kind != "scripted" else None
+
+    def aim(self, pad, target_pad, match):
+        if self.cpu:
+            self.cpu.aim(pad, target_pad, match.gravity_objects, match.black_holes)
+        else:
+            scripted_aim(pad, target_pad, match)
+
+    @property
+    def simulations(self):
+        """Shots the CPU simulated while aiming so far"""
+        return self.cpu.simulations if self.cpu else 0
+
+
+def play_match(kinds, seed, max_turns=MAX_TURNS, max_turn_frames=MAX_TURN_FRAMES,
+               replay_dir=None):
+    """Play one match between kinds[0] (left pad) and kinds[1] (right pad).
+
+    With replay_dir the match is saved there as <seed>.gmr; every shot goes
+    through Match.shot(), so the replay needs no CPU search to play back.
+    """
+    random.seed(seed)
+    match = reset_game(False, None, seed=seed)
+    match.keep_history = False  # Trails are only kept to be drawn
+    controllers = [Controller(kinds[0], match.map_id), Controller(kinds[1], match.map_id)]
+
+    shots = [0, 0]
+    hits = [0, 0]
+    frames = 0
+    while not match.game_over and sum(shots) < max_turns:
+        shooter = match.current_player
+        pad = match.current
+        target = match.players[1 - shooter]
+        target_health = target.health
+
+        controllers[shooter].aim(pad, target, match)
+        match.shot(pad.angle, pad.power)
+        shots[shooter] += 1
+
+        turn_frames = 0
+        while match.missile_fired and not match.game_over and turn_frames < max_turn_frames:
+            match.update()
+            match.events.clear()
+            turn_frames += 1
+        if match.missile_fired and not match.game_over:
+            match.press(KEY_P)
+        frames += turn_frames
+
+        # Every hit on the opponent takes 20 health
+        hits[shooter] += (target_health - target.health) // 20
+
+    winner = None
+    if match.game_over:
+        winner = match.players.index(match.winner)
+    if replay_dir:
+        # Before cancel() recycles the missiles the replay's digest covers
+        Replay.from_match(match).save(os.path.join(replay_dir, f"{seed}.gmr"))
+    match.cancel()
+    return {
+        "seed": seed,
+        "player1": kinds[0],
+        "player2": kinds[1],
+        "winner": winner,
+        "turns": sum(shots),
+        "shots1": shots[0],
+        "shots2": shots[1],
+        "hits1": hits[0],
+        "hits2": hits[1],
+        "sims1": controllers[0].simulations,
+        "sims2": controllers[1].simulations,
+        "frames": frames,
+    }
+
+
+def _play_task(task):
+    return play_match(*task)
+
+
+def run_matches(kinds, num_matches, workers=None, seed=0, alternate_sides=True,
+                max_turns=MAX_TURNS, replay_dir=None):
+    """Play num_matches across a process pool and return the per-match results.
+
+    Match i uses seed + i. With alternate_sides, odd matches swap which kind
+    gets the left pad (and the first shot); results are always reported from
+    the point of view of kinds[0] as player 1. With replay_dir every match
+    is saved there as a replay (see play_match).
+    """
+    if replay_dir:
+        os.makedirs(replay_dir, exist_ok=True)
+    tasks = []
+    for i in range(num_matches):
+        swapped = alternate_sides and i % 2 == 1
+        tasks.append(((kinds[1], kinds[0]) if swapped else tuple(kinds), seed + i, max_turns,
+                      MAX_TURN_FRAMES, replay_dir))
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        results = [_play_task(task) for task in tasks]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            chunksize = max(1, num_matches // (workers * 8))
+            results = list(pool.map(_play_task, tasks, chunksize=chunksize))
+
+    return [_from_first_kind(result, kinds) for result in results]
+
+
+def _from_first_kind(result, kinds):
+    """Flip a swapped-sides result so player 1 is always kinds[0]"""
+    if result["player1"] == kinds[0]:
+        return result
+    flipped = dict(result)
+    flipped.update(player1=result["player2"], player2=result["player1"],
+                   shots1=result["shots2"], shots2=result["shots1"],
+                   hits1=result["hits2"], hits2=result["hits1"],
+                   sims1=result["sims2"], sims2=result["sims1"],
+                   winner=None if result["winner"] is None else 1 - result["winner"])
+    return flipped
+
+
+def summarize(results, elapsed):
+    decided = [r for r in results if r["winner"] is not None]
+    num = len(results)
+
+    def ratio(a, b):
+        return a / b if b else None
+
+    return {
+        "player1": results[0]["player1"] if results else None,
+        "player2": results[0]["player2"] if results else None,
+        "matches": num,
+        "win_rate1": ratio(sum(r["winner"] == 0 for r in results), num),
+        "win_rate2": ratio(sum(r["winner"] == 1 for r in results), num),
+        "draw_rate": ratio(num - len(decided), num),
+        "turns_to_kill": ratio(sum(r["turns"] for r in decided), len(decided)),
+        "shots_per_hit1": ratio(sum(r["shots1"] for r in results), sum(r["hits1"] for r in results)),
+        "shots_per_hit2": ratio(sum(r["shots2"] for r in results), sum(r["hits2"] for r in results)),
+        "sims_per_shot1": ratio(sum(r["sims1"] for r in results), sum(r["shots1"] for r in results)),
+        "sims_per_shot2": ratio(sum(r["sims2"] for r in results), sum(r["shots2"] for r in results)),
+        "seconds": elapsed,
+        "matches_per_sec": ratio(num, elapsed),
+    }
+
+
+def write_results(path, summary, results):
+    """JSON gets the summary plus every match; CSV gets one row per match.
+
+    The CSV summary goes next to it as <name>.summary.csv, one row of the
+    same fields as the JSON one, so a spreadsheet reads both as tables.
+    """
+    if path.endswith(".csv"):
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+            writer.writeheader()
+            writer.writerows(results)
+        with open(path[:-len(".csv")] + ".summary.csv", "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(summary))
+            writer.writeheader()
+            writer.writerow(summary)
+    else:
+        with open(path, "w") as f:
+            json.dump({"summary": summary, "matches": results}, f, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play headless CPU-vs-CPU Gravity Missiles matches")
+    parser.add_argument("player1", choices=PLAYER_KINDS)
+    parser.add_argument("player2", choices=PLAYER_KINDS)
+    parser.add_argument("--matches", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first match")
+    parser.add_argument("--max-turns", type=int, default=MAX_TURNS,
+                        help="shots before an undecided match is a draw (draws cost the most)")
+    parser.add_argument("--same-sides", action="store_true",
+                        help="always give player1 the left pad instead of alternating")
+    parser.add_argument("--out", help="write results to a .json or .csv file "
+                                      "(a .csv also gets a .summary.csv beside it)")
+    parser.add_argument("--replays", metavar="DIR",
+                        help="save every match to DIR as <seed>.gmr (see replay.py)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    results = run_matches((args.player1, args.player2), args.matches, args.workers, args.seed,
+                          alternate_sides=not args.same_sides, max_turns=args.max_turns,
+                          replay_dir=args.replays)
+    summary = summarize(results, time.perf_counter() - start)
+
+    if args.out:
+        write_results(args.out, summary, results)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
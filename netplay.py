@@ -0,0 +1,583 @@
+"""Two-player matches over the network, in lockstep.
+
+Only inputs cross the wire. Both peers run the same seeded Match (as in
+replay.py, the seed and the inputs are the whole game) and simulate a frame
+only once both players' inputs for it are in. Whatever is typed while frame
+F runs takes effect on frame F + input_delay, so as long as a message gets
+across within that delay nobody waits. Each peer sends one INPUTS message
+per batch_frames frames (sooner when stalled on the other peer), which is
+usually empty and about 8 bytes, so a match costs a couple of hundred bytes
+a second each way instead of a state stream. Every DIGEST_INTERVAL frames
+the peers compare replay.state_digest() to catch a desync, such as two
+platforms rounding floats differently.
+
+The transport is an asyncio Protocol on an event loop that the game pumps once
+a frame with poll(), so there are no threads and no locks. delay and jitter
+hold back every outgoing message (keeping their order, like TCP does) to try
+a bad connection on localhost:
+
+    python main.py --host                       # Player 1, waits on DEFAULT_PORT
+    python main.py --join 127.0.0.1 --net-delay 60 --net-jitter 20
+    python netplay.py --delay 50 --jitter 20    # two scripted peers, checks they stay in sync
+"""
+import argparse
+import asyncio
+import collections
+import json
+import random
+import struct
+import sys
+import time
+
+from core import HEIGHT, KEY_DOWN, KEY_LEFT, KEY_P, KEY_RIGHT, KEY_SPACE, KEY_UP, WIDTH, Match
+from integrators import make_integrator
+from replay import DEFAULT_PHYSICS, match_field, state_digest
+
+MAGIC = b"GMNP"
+VERSION = 1
+DEFAULT_PORT = 47474
+
+INPUT_DELAY = 8  # Frames from an input to the frame it takes effect on
+MAX_INPUT_DELAY = 255  # HELLO carries the input delay in a byte
+BATCH_FRAMES = 2  # Frames of inputs per INPUTS message
+MAX_BATCH_FRAMES = 255  # Input records carry their frame offset in a byte
+PING_INTERVAL = 0.5  # Seconds between round trip measurements
+DIGEST_INTERVAL = 120  # Frames between state_digest() comparisons
+
+# Every message is a length, then its type byte and body
+_LENGTH = struct.Struct("<H")
+_HELLO = struct.Struct("<4sBQBH")  # magic, version, seed, input delay, settings length
+_INPUTS = struct.Struct("<IB")  # first frame, frame count, then records
+_RECORD = struct.Struct("<BB")  # frame offset, op, then the op's arguments
+_PRESS = struct.Struct("<B")
+_DRAG = struct.Struct("<hh")
+_STAMP = struct.Struct("<d")  # Sender's clock, echoed back in the PONG
+_DIGEST = struct.Struct("<II")  # frame, state_digest()
+
+HELLO, INPUTS, PING, PONG, DIGEST = range(5)
+
+_OPS = {'press': (0, _PRESS), 'drag': (1, _DRAG)}
+_NAMES = {code: (name, layout) for name, (code, layout) in _OPS.items()}
+
+
+class NetError(Exception):
+    """A peer that broke the protocol, went away or went out of sync"""
+
+
+def _check_batch_frames(batch_frames):
+    if not 1 <= batch_frames <= MAX_BATCH_FRAMES:
+        raise ValueError(f"batch_frames must be 1 to {MAX_BATCH_FRAMES}, got {batch_frames}")
+
+
+def _check_input_delay(input_delay):
+    # With no delay every frame would wait for the other peer's inputs for itself
+    if not 1 <= input_delay <= MAX_INPUT_DELAY:
+        raise ValueError(f"input_delay must be 1 to {MAX_INPUT_DELAY}, got {input_delay}")
+
+
+class Lockstep:
+    """The input schedule of one peer, with no I/O.
+
+    queue() takes the local player's inputs, advance() runs the match's next
+    frame once both players' inputs for it are known, and receive() takes the
+    other peer's messages; the ones to send pile up in outbox. Inputs are
+    applied player 1's first and only for the player whose turn it is at
+    that point, so both peers drop the same stray ones.
+    """
+
+    def __init__(self, local_player, input_delay=INPUT_DELAY, batch_frames=BATCH_FRAMES):
+        _check_batch_frames(batch_frames)
+        _check_input_delay(input_delay)
+        self.local_player = local_player
+        self.remote_player = 1 - local_player
+        self.input_delay = input_delay
+        self.batch_frames = batch_frames
+        self.scheduled = ({}, {})  # Per player, frame -> [(op, args)] for frames with inputs
+        # Frames below known[player] have all of that player's inputs (none before input_delay)
+        self.known = [input_delay, input_delay]
+        self.typed = []  # Local inputs since the last frame ran
+        self.unsent = []  # Local (frame, op, args) scheduled since the last INPUTS message
+        self.sent_until = input_delay
+        self.digests = ({}, {})  # Per player, frame -> digest not matched up yet
+        self.outbox = []
+        self.stalls = 0  # advance() calls that had to wait for the other peer
+        self.desync = None  # First frame the digests disagreed on
+
+    def queue(self, op, *args):
+        self.typed.append((op, args))
+
+    def ready(self, frame):
+        return frame < self.known[self.remote_player]
+
+    def advance(self, match, field=None):
+        """Run match's next frame if the other player's inputs for it are in (True if it ran)"""
+        frame = match.frame
+        if not self.ready(frame):
+            self.stalls += 1
+            # The other peer may be stalled on us: a batch longer than
+            # input_delay would never fill otherwise
+            self.flush()
+            return False
+        due = frame + self.input_delay
+        for op, args in self.typed:
+            self.scheduled[self.local_player].setdefault(due, []).append((op, args))
+            self.unsent.append((due, op, args))
+        self.typed = []
+        self.known[self.local_player] = due + 1
+        if self.known[self.local_player] - self.sent_until >= self.batch_frames:
+            self.flush()
+
+        for player in (0, 1):
+            for op, args in self.scheduled[player].pop(frame, ()):
+                if match.current_player == player:
+                    getattr(match, op)(*args)
+        match.update(field)
+
+        if match.frame % DIGEST_INTERVAL == 0:
+            digest = state_digest(match)
+            self._digest(self.local_player, match.frame, digest)
+            self.outbox.append(bytes([DIGEST]) + _DIGEST.pack(match.frame, digest))
+        return True
+
+    def flush(self):
+        """Queue an INPUTS message for the local frames scheduled since the last one"""
+        end = self.known[self.local_player]
+        if end == self.sent_until:
+            return
+        out = bytearray([INPUTS])
+        out += _INPUTS.pack(self.sent_until, end - self.sent_until)
+        for frame, op, args in self.unsent:
+            code, layout = _OPS[op]
+            out += _RECORD.pack(frame - self.sent_until, code)
+            out += layout.pack(*args)
+        self.outbox.append(bytes(out))
+        self.unsent = []
+        self.sent_until = end
+
+    def receive(self, message):
+        """Take an INPUTS or DIGEST message from the other peer"""
+        try:
+            if message[0] == INPUTS:
+                self._receive_inputs(message)
+            elif message[0] == DIGEST:
+                frame, digest = _DIGEST.unpack_from(message, 1)
+                self._digest(self.remote_player, frame, digest)
+            else:
+                raise NetError(f"unexpected message type {message[0]}")
+        except (IndexError, struct.error):
+            raise NetError("truncated message") from None
+
+    def _receive_inputs(self, message):
+        first, count = _INPUTS.unpack_from(message, 1)
+        if first != self.known[self.remote_player]:
+            raise NetError(f"inputs from frame {first}, expected {self.known[self.remote_player]}")
+        scheduled = self.scheduled[self.remote_player]
+        pos = 1 + _INPUTS.size
+        while pos < len(message):
+            offset, code = _RECORD.unpack_from(message, pos)
+            if code not in _NAMES or offset >= count:
+                raise NetError("corrupt inputs")
+            op, layout = _NAMES[code]
+            args = layout.unpack_from(message, pos + _RECORD.size)
+            pos += _RECORD.size + layout.size
+            scheduled.setdefault(first + offset, []).append((op, args))
+        self.known[self.remote_player] = first + count
+
+    def _digest(self, player, frame, digest):
+        other = self.digests[1 - player].pop(frame, None)
+        if other is None:
+            self.digests[player][frame] = digest
+        elif other != digest and self.desync is None:
+            self.desync = frame
+
+
+class _Stream(asyncio.Protocol):
+    """Cuts the byte stream into messages for its session as the data arrives"""
+
+    def __init__(self, session):
+        self.session = session
+        self.transport = None
+        self.buffer = bytearray()
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.session._connection_made(transport)
+
+    def data_received(self, data):
+        self.buffer += data
+        while len(self.buffer) >= _LENGTH.size:
+            (size,) = _LENGTH.unpack_from(self.buffer)
+            end = _LENGTH.size + size
+            if len(self.buffer) < end:
+                break
+            message = bytes(self.buffer[_LENGTH.size:end])
+            del self.buffer[:end]
+            self.session._message_received(message, end)
+
+    def connection_lost(self, error):
+        # Not for a second guest that was turned away
+        if self.session._transport is self.transport:
+            self.session._fail(f"connection lost: {error}" if error else "the other player left")
+
+
+class NetSession:
+    """One peer's connection, on an asyncio event loop the caller pumps with poll().
+
+    host() listens for the other player and hands them the seed and the
+    settings (map_mode and the replay.DEFAULT_PHYSICS names) when they
+    join(); the host plays Player 1. connected turns True once both sides
+    said hello, and error says why the session ended if it did. stats()
+    has the latency and bandwidth counters.
+    """
+
+    def __init__(self, batch_frames=BATCH_FRAMES, delay=0.0, jitter=0.0, rng=None):
+        # Checked here too, as a guest only makes its Lockstep once the host says hello
+        _check_batch_frames(batch_frames)
+        self.loop = asyncio.new_event_loop()
+        self.batch_frames = batch_frames
+        self.delay = delay  # Seconds every outgoing message is held back
+        self.jitter = jitter  # Up to this much more or less, at random
+        self.rng = rng or random.Random()
+        self.seed = None
+        self.settings = None
+        self.lockstep = None
+        self.port = None
+        self.connected = False
+        self.error = None
+        self.start = None
+        self._server = None
+        self._transport = None
+        self._task = None
+        self._held = collections.deque()  # (due, data) held back by delay and jitter
+        self._last_ping = 0.0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.messages_sent = 0
+        self.messages_received = 0
+        self.rtt = None  # Seconds, last measured
+        self.rtt_min = None
+        self.rtt_max = None
+        self._rtt_total = 0.0
+        self._rtt_count = 0
+
+    @classmethod
+    def host(cls, port, seed, settings, input_delay=INPUT_DELAY, address=None, **kwargs):
+        """Listen on port (0 picks a free one, see .port) for the other player"""
+        session = cls(**kwargs)
+        session.seed = seed
+        session.settings = settings
+        session.lockstep = Lockstep(0, input_delay, session.batch_frames)
+        session._server = session.loop.run_until_complete(
+            session.loop.create_server(lambda: _Stream(session), address, port))
+        session.port = session._server.sockets[0].getsockname()[1]
+        return session
+
+    @classmethod
+    def join(cls, address, port, **kwargs):
+        """Connect to a host; the seed and settings arrive with its hello"""
+        session = cls(**kwargs)
+        session.port = port
+        session._task = session.loop.create_task(session._join(address, port))
+        return session
+
+    @property
+    def local_player(self):
+        return self.lockstep.local_player
+
+    def physics(self):
+        """The replay.DEFAULT_PHYSICS settings both peers play with"""
+        return {name: self.settings.get(name, default) for name, default in DEFAULT_PHYSICS.items()}
+
+    def poll(self):
+        """Let the network run: send what's due and take in what has arrived"""
+        if self.loop.is_closed():
+            return
+        if self.connected:
+            now = time.perf_counter()
+            if now - self._last_ping >= PING_INTERVAL:
+                self._last_ping = now
+                self._send(bytes([PING]) + _STAMP.pack(now))
+            self._send_outbox()
+        # One pass over whatever is ready, without blocking
+        self.loop.call_soon(self.loop.stop)
+        self.loop.run_forever()
+        if self.lockstep and self.lockstep.desync is not None:
+            self._fail(f"out of sync with the other player at frame {self.lockstep.desync}")
+
+    def queue(self, op, *args):
+        """A local 'press' or 'drag' (Match method and arguments), sent with the next batch"""
+        self.lockstep.queue(op, *args)
+
+    def advance(self, match, field=None):
+        """Run match's next frame once both players' inputs for it are in (True if it ran)"""
+        ran = self.lockstep.advance(match, field)
+        self._send_outbox()
+        return ran
+
+    def flush(self):
+        """Send the frames scheduled so far without waiting for a full batch"""
+        self.lockstep.flush()
+        self._send_outbox()
+
+    def close(self):
+        if self.loop.is_closed():
+            return
+        self._fail("the session was closed")
+        if self._server:
+            self._server.close()
+        if self._task:
+            self._task.cancel()
+        # Let the transports finish closing
+        self.loop.run_until_complete(asyncio.sleep(0))
+        self.loop.close()
+
+    def stats(self):
+        """Latency (ms), traffic (bytes, messages, bytes/s) and frames stalled so far"""
+        elapsed = time.perf_counter() - self.start if self.start else 0.0
+
+        def ms(seconds):
+            return seconds * 1000 if seconds is not None else None
+        return {
+            'rtt_ms': ms(self.rtt),
+            'rtt_min_ms': ms(self.rtt_min),
+            'rtt_max_ms': ms(self.rtt_max),
+            'rtt_mean_ms': ms(self._rtt_total / self._rtt_count) if self._rtt_count else None,
+            'bytes_sent': self.bytes_sent,
+            'bytes_received': self.bytes_received,
+            'messages_sent': self.messages_sent,
+            'messages_received': self.messages_received,
+            'sent_per_s': self.bytes_sent / elapsed if elapsed else 0.0,
+            'received_per_s': self.bytes_received / elapsed if elapsed else 0.0,
+            'stalls': self.lockstep.stalls if self.lockstep else 0,
+            'input_delay': self.lockstep.input_delay if self.lockstep else None,
+        }
+
+    async def _join(self, address, port):
+        try:
+            await self.loop.create_connection(lambda: _Stream(self), address, port)
+        except OSError as error:
+            self._fail(f"could not connect to {address}:{port}: {error.strerror or error}")
+
+    def _connection_made(self, transport):
+        if self._transport is not None or self.error:
+            transport.close()  # Already playing someone
+            return
+        self._transport = transport
+        if self._server:
+            self._server.close()
+            # The host says hello first; the guest answers once it has the settings
+            self._send(self._hello())
+
+    def _hello(self):
+        settings = json.dumps(self.settings, separators=(',', ':')).encode()
+        return (bytes([HELLO]) + _HELLO.pack(MAGIC, VERSION, self.seed,
+                                             self.lockstep.input_delay, len(settings)) + settings)
+
+    def _take_hello(self, message):
+        if len(message) < 1 + _HELLO.size or message[0] != HELLO:
+            raise NetError("not a Gravity Missiles player")
+        magic, version, seed, input_delay, size = _HELLO.unpack_from(message, 1)
+        if magic != MAGIC:
+            raise NetError("not a Gravity Missiles player")
+        if version != VERSION:
+            raise NetError(f"the other player speaks protocol version {version}, "
+                           f"this game version {VERSION}")
+        if self.lockstep is None:
+            start = 1 + _HELLO.size
+            self.seed = seed
+            self.settings = json.loads(message[start:start + size])
+            self.lockstep = Lockstep(1, input_delay, self.batch_frames)
+            self._send(self._hello())
+
+    def _message_received(self, message, size):
+        if self.error:
+            return
+        self.bytes_received += size
+        self.messages_received += 1
+        try:
+            if not message:
+                raise NetError("empty message")
+            if not self.connected:
+                self._take_hello(message)
+                self.connected = True
+                self.start = time.perf_counter()
+            elif message[0] == PING:
+                self._send(bytes([PONG]) + message[1:])
+            elif message[0] == PONG:
+                (stamp,) = _STAMP.unpack_from(message, 1)
+                self._round_trip(time.perf_counter() - stamp)
+            else:
+                self.lockstep.receive(message)
+        except (NetError, ValueError, struct.error) as error:
+            self._fail(str(error) if isinstance(error, NetError) else "corrupt message")
+
+    def _round_trip(self, rtt):
+        self.rtt = rtt
+        self.rtt_min = rtt if self.rtt_min is None else min(self.rtt_min, rtt)
+        self.rtt_max = rtt if self.rtt_max is None else max(self.rtt_max, rtt)
+        self._rtt_total += rtt
+        self._rtt_count += 1
+
+    def _send_outbox(self):
+        if self.connected and self.lockstep.outbox:
+            for message in self.lockstep.outbox:
+                self._send(message)
+            self.lockstep.outbox.clear()
+
+    def _send(self, message):
+        data = _LENGTH.pack(len(message)) + message
+        self.bytes_sent += len(data)
+        self.messages_sent += 1
+        if not (self.delay or self.jitter):
+            self._transport.write(data)
+            return
+        # Held back like on a slow link, but never overtaking an earlier message
+        due = self.loop.time() + self.delay + self.rng.uniform(-self.jitter, self.jitter)
+        if self._held:
+            due = max(due, self._held[-1][0])
+        self._held.append((due, data))
+        if len(self._held) == 1:
+            self.loop.call_at(due, self._write_held)
+
+    def _write_held(self):
+        now = self.loop.time()
+        while self._held and self._held[0][0] <= now:
+            _, data = self._held.popleft()
+            if not self._transport.is_closing():
+                self._transport.write(data)
+        if self._held:
+            self.loop.call_at(self._held[0][0], self._write_held)
+
+    def _fail(self, reason):
+        if self.error is None:
+            self.error = reason
+        self.connected = False
+        if self._transport:
+            self._transport.close()
+
+
+def format_stats(stats):
+    """One line of stats() for the HUD and the self test"""
+    rtt = f"{stats['rtt_ms']:.0f} ms" if stats['rtt_ms'] is not None else "-"
+    return (f"RTT {rtt} | {stats['sent_per_s']:.0f} B/s up, {stats['received_per_s']:.0f} B/s down"
+            f" | {stats['stalls']} stalled frames")
+
+
+class ScriptedPlayer:
+    """Random aiming, firing and steering, for the self test to send over the wire"""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.turn = None
+        self.turn_frames = 0
+
+    def inputs(self, match):
+        """This frame's (op, args) for the player whose turn it is"""
+        if match.turn != self.turn:
+            self.turn = match.turn
+            self.turn_frames = 0
+        self.turn_frames += 1
+        roll = self.rng.random()
+        if self.turn_frames > 600:
+            return [('press', (KEY_P,))]  # A shot stuck in orbit
+        if not match.missile_fired:
+            if roll < 0.1:
+                return [('press', (self.rng.choice((KEY_LEFT, KEY_RIGHT, KEY_UP, KEY_DOWN)),))]
+            if roll < 0.12:
+                return [('drag', (self.rng.randrange(WIDTH), self.rng.randrange(HEIGHT)))]
+            if roll < 0.14:
+                return [('press', (KEY_SPACE,))]
+        elif roll < 0.05:
+            return [('press', (self.rng.choice((KEY_SPACE, KEY_DOWN, KEY_LEFT, KEY_RIGHT)),))]
+        return []
+
+
+def self_test(seconds, delay, jitter, input_delay, batch_frames, seed=1, fps=60):
+    """Play two scripted peers against each other over localhost; returns their sessions and matches"""
+    settings = dict(DEFAULT_PHYSICS, map_mode="classic")
+    host = NetSession.host(0, seed, settings, input_delay, address="127.0.0.1",
+                           batch_frames=batch_frames, delay=delay, jitter=jitter,
+                           rng=random.Random(f"{seed}:host"))
+    guest = NetSession.join("127.0.0.1", host.port, batch_frames=batch_frames, delay=delay,
+                            jitter=jitter, rng=random.Random(f"{seed}:guest"))
+    sessions = [host, guest]
+    try:
+        deadline = time.perf_counter() + 5
+        while not all(session.connected for session in sessions):
+            for session in sessions:
+                session.poll()
+                if session.error:
+                    raise NetError(session.error)
+            if time.perf_counter() > deadline:
+                raise NetError("the peers never finished their hello")
+            time.sleep(0.001)
+
+        matches = []
+        for session in sessions:
+            physics = session.physics()
+            integrator = None
+            if physics['integrator']:
+                integrator = make_integrator(physics['integrator'], adaptive=physics['adaptive'])
+            matches.append(Match(integrator=integrator, map_mode=session.settings['map_mode'],
+                                 seed=session.seed))
+        players = [ScriptedPlayer(random.Random(f"{seed}:player{i}")) for i in range(2)]
+
+        frames = round(seconds * fps)
+        next_frame = time.perf_counter()
+        while min(match.frame for match in matches) < frames:
+            for session, match, player in zip(sessions, matches, players):
+                session.poll()
+                if session.error:
+                    raise NetError(session.error)
+                if match.frame >= frames:
+                    session.flush()  # The other peer still needs our last frames
+                    continue
+                if match.current_player == session.local_player:
+                    for op, args in player.inputs(match):
+                        session.queue(op, *args)
+                session.advance(match, match_field(match, session.physics()))
+            next_frame += 1 / fps
+            time.sleep(max(0.0, next_frame - time.perf_counter()))
+        return sessions, matches
+    finally:
+        for session in sessions:
+            session.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Play two scripted lockstep peers over localhost and check they stay in sync")
+    parser.add_argument("--seconds", type=float, default=20, help="match time to play, at 60 fps")
+    parser.add_argument("--delay", type=float, default=0, help="ms each message is held back")
+    parser.add_argument("--jitter", type=float, default=0, help="ms of random extra or less delay")
+    parser.add_argument("--input-delay", type=int, default=INPUT_DELAY,
+                        help="frames from an input to the frame it takes effect on")
+    parser.add_argument("--batch-frames", type=int, default=BATCH_FRAMES,
+                        help="frames of inputs per message")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    if not 1 <= args.batch_frames <= MAX_BATCH_FRAMES:
+        parser.error(f"--batch-frames must be 1 to {MAX_BATCH_FRAMES}")
+    if not 1 <= args.input_delay <= MAX_INPUT_DELAY:
+        parser.error(f"--input-delay must be 1 to {MAX_INPUT_DELAY}")
+
+    try:
+        sessions, matches = self_test(args.seconds, args.delay / 1000, args.jitter / 1000,
+                                      args.input_delay, args.batch_frames, args.seed)
+    except NetError as error:
+        print(error, file=sys.stderr)
+        return 1
+    for name, session, match in zip(("host", "guest"), sessions, matches):
+        stats = session.stats()
+        print(f"{name:<6} {match.frame} frames, {len(match.inputs)} inputs, turn {match.turn}: "
+              f"{format_stats(stats)}, RTT {stats['rtt_min_ms']:.0f}-{stats['rtt_max_ms']:.0f} ms, "
+              f"{stats['messages_sent']} messages sent")
+    if matches[0].inputs != matches[1].inputs or state_digest(matches[0]) != state_digest(matches[1]):
+        print("the peers went out of sync", file=sys.stderr)
+        return 1
+    print("in sync")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,619 @@
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Gravitational constants (scaled for gameplay), shared with the game objects
+PLANET_G = 1.0
+BLACK_HOLE_G = 5.0
+
+
+class MissileSwarm:
+    """Structure-of-arrays physics for every missile in flight.
+
+    Missile objects stay the source of truth between frames (thrusts and
+    collisions still poke at them directly), so each step gathers the active
+    missiles into NumPy arrays, advances them all against every body at once
+    and scatters the results back. Bodies are applied one at a time in the
+    same order as Missile.update, so the floating point results match it
+    exactly.
+    """
+
+    def __init__(self, width, height, capacity=32):
+        self.width = width
+        self.height = height
+        self.missiles = []
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self.capacity = capacity
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.vx = np.zeros(capacity)
+        self.vy = np.zeros(capacity)
+        self.cooldown = np.zeros(capacity, dtype=np.int64)
+        self.active = np.zeros(capacity, dtype=bool)
+
+    def gather(self, missiles):
+        """Copy the state of the active missiles into the arrays"""
+        self.missiles = [m for m in missiles if m.active]
+        n = len(self.missiles)
+        if n > self.capacity:
+            self._allocate(max(n, self.capacity * 2))
+
+        for i, m in enumerate(self.missiles):
+            self.x[i] = m.x
+            self.y[i] = m.y
+            self.vx[i] = m.vx
+            self.vy[i] = m.vy
+            self.cooldown[i] = m.thrust_cooldown
+        self.active[:n] = True
+        self.active[n:] = False
+        return n
+
+    def scatter(self):
+        """Write the arrays back to the missiles and extend their trails"""
+        xs = self.x.tolist()
+        ys = self.y.tolist()
+        vxs = self.vx.tolist()
+        vys = self.vy.tolist()
+        cooldowns = self.cooldown.tolist()
+        active = self.active.tolist()
+        moved = self._moved.tolist()
+
+        for i, m in enumerate(self.missiles):
+            m.x = xs[i]
+            m.y = ys[i]
+            m.vx = vxs[i]
+            m.vy = vys[i]
+            m.thrust_cooldown = cooldowns[i]
+            m.active = active[i]
+
+            # Captured missiles stop before moving, like Missile.update
+            if moved[i]:
+                m.trail.append((int(m.x), int(m.y)))
+
+    def step(self, gravity_objects, black_holes, field=None):
+        """Advance every gathered missile by one frame
+
+        With an AccelerationField the per-body sums become one lookup; black
+        holes are still checked for captures.
+        """
+        n = len(self.missiles)
+        x = self.x[:n]
+        y = self.y[:n]
+        vx = self.vx[:n]
+        vy = self.vy[:n]
+        cooldown = self.cooldown[:n]
+        active = self.active[:n]
+
+        np.subtract(cooldown, 1, out=cooldown, where=cooldown > 0)
+
+        if field is not None:
+            fx, fy = field.sample_many(x, y)
+            vx += fx
+            vy += fy
+        else:
+            # Apply gravity from all objects
+            for obj in gravity_objects:
+                fx, fy = _gravity_force(obj.x, obj.y, PLANET_G * obj.mass, x, y)
+                vx += fx
+                vy += fy
+
+        # Apply gravity from black holes, dropping captured missiles as we go
+        for bh in black_holes:
+            if field is None:
+                fx, fy = _gravity_force(bh.x, bh.y, BLACK_HOLE_G * bh.mass, x, y)
+                np.add(vx, fx, out=vx, where=active)
+                np.add(vy, fy, out=vy, where=active)
+
+            dx = x - bh.x
+            dy = y - bh.y
+            captured = dx*dx + dy*dy < bh.event_horizon * bh.event_horizon
+            active &= ~captured
+
+        # Update position of the survivors
+        self._moved = active.copy()
+        np.add(x, vx, out=x, where=active)
+        np.add(y, vy, out=y, where=active)
+
+        # Check boundaries
+        out = (x < 0) | (x > self.width) | (y < 0) | (y > self.height)
+        active &= ~out
+
+    def update(self, missiles, gravity_objects, black_holes, field=None):
+        """Gather, step and scatter in one call (drop-in for Missile.update)"""
+        if self.gather(missiles):
+            self.step(gravity_objects, black_holes, field)
+            self.scatter()
+
+
+def _gravity_force(body_x, body_y, gm, x, y):
+    """Vectorized GravityObject.get_gravity_force, same operation order"""
+    dx = body_x - x
+    dy = body_y - y
+    dist_sq = dx*dx + dy*dy + 1  # +1 to avoid division by zero
+    dist = np.sqrt(dist_sq)
+    force = gm / dist_sq
+    return (force * dx / dist, force * dy / dist)
+
+
+def exact_acceleration(x, y, gravity_objects, black_holes):
+    """Summed planet + black hole pull at the points (x, y), body by body"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    ax = np.zeros(x.shape)
+    ay = np.zeros(x.shape)
+    for obj in gravity_objects:
+        fx, fy = _gravity_force(obj.x, obj.y, PLANET_G * obj.mass, x, y)
+        ax += fx
+        ay += fy
+    for bh in black_holes:
+        fx, fy = _gravity_force(bh.x, bh.y, BLACK_HOLE_G * bh.mass, x, y)
+        ax += fx
+        ay += fy
+    return ax, ay
+
+
+def _drain(flight):
+    """Run a flight generator to the end and return its result"""
+    while True:
+        try:
+            next(flight)
+        except StopIteration as stop:
+            return stop.value
+
+
+def simulate_shots(origin_x, origin_y, target_x, target_y, angles, powers,
+                   gravity_objects, black_holes, width, height,
+                   steps=200, hit_radius=30, field=None):
+    """Simulate many shots at once and score each like CPUPlayer.simulate_shot
+
+    angles (degrees) and powers are equal-length sequences, one entry per
+    candidate. Returns an array with the closest approach to the target for
+    every candidate (inf when it falls into a black hole). Each candidate
+    stops on its own when captured, leaving the screen or coming within
+    hit_radius of the target; the loop ends once none are left in flight.
+    An AccelerationField, if given, replaces the per-body force sums.
+
+    The arithmetic is done in the same order as simulate_shot, but NumPy's
+    vectorized cos, sin and sqrt can round the last bit differently from
+    the math module's, so a score may differ from simulate_shot's by an
+    ulp or so (tests/test_physics.py holds them to rel_tol=1e-12).
+    """
+    return _drain(fly_shots(origin_x, origin_y, target_x, target_y, angles, powers,
+                            gravity_objects, black_holes, width, height, steps, hit_radius, field))
+
+
+def fly_shots(origin_x, origin_y, target_x, target_y, angles, powers,
+              gravity_objects, black_holes, width, height,
+              steps=200, hit_radius=30, field=None):
+    """simulate_shots() one frame of flight at a time: yields after each step, returns the scores"""
+    angle_rad = np.radians(np.asarray(angles, dtype=float))
+    power = np.asarray(powers, dtype=float)
+    cos = np.cos(angle_rad)
+    sin = np.sin(angle_rad)
+    x = origin_x + cos * 35
+    y = origin_y + sin * 35
+    vx = cos * power
+    vy = sin * power
+
+    n = len(x)
+    min_dist = np.full(n, np.inf)
+    score = np.full(n, np.inf)
+    flying = np.ones(n, dtype=bool)
+
+    planets = [(obj.x, obj.y, PLANET_G * obj.mass) for obj in gravity_objects]
+    holes = [(bh.x, bh.y, BLACK_HOLE_G * bh.mass, bh.event_horizon) for bh in black_holes]
+
+    for step in range(steps):
+        if not flying.any():
+            break
+
+        # Only carry on with the candidates still in flight
+        idx = np.flatnonzero(flying)
+        cx, cy, cvx, cvy = x[idx], y[idx], vx[idx], vy[idx]
+
+        # Apply gravity
+        if field is not None:
+            fx, fy = field.sample_many(cx, cy)
+            cvx += fx
+            cvy += fy
+        else:
+            for bx, by, gm in planets:
+                fx, fy = _gravity_force(bx, by, gm, cx, cy)
+                cvx += fx
+                cvy += fy
+
+        alive = np.ones(len(idx), dtype=bool)
+        for bx, by, gm, horizon in holes:
+            if field is None:
+                fx, fy = _gravity_force(bx, by, gm, cx, cy)
+                cvx += fx
+                cvy += fy
+
+            # Captured shots are bad shots
+            dx = cx - bx
+            dy = cy - by
+            alive &= dx*dx + dy*dy >= horizon * horizon
+
+        captured = idx[~alive]
+        flying[captured] = False
+        score[captured] = np.inf
+
+        # Update position
+        idx = idx[alive]
+        cx = cx[alive] + cvx[alive]
+        cy = cy[alive] + cvy[alive]
+        x[idx] = cx
+        y[idx] = cy
+        vx[idx] = cvx[alive]
+        vy[idx] = cvy[alive]
+
+        # Check distance to target
+        dx = cx - target_x
+        dy = cy - target_y
+        dist = np.sqrt(dx*dx + dy*dy)
+        min_dist[idx] = np.minimum(min_dist[idx], dist)
+
+        # Very close is a good shot, report that distance
+        hit = dist < hit_radius
+        score[idx[hit]] = dist[hit]
+        flying[idx[hit]] = False
+
+        # Leaving the screen keeps the closest approach so far
+        out = ~hit & ((cx < 0) | (cx > width) | (cy < 0) | (cy > height))
+        score[idx[out]] = min_dist[idx[out]]
+        flying[idx[out]] = False
+        yield
+
+    # Shots that ran out of steps keep their closest approach
+    score[flying] = min_dist[flying]
+    return score
+
+
+def simulate_paths(origin_x, origin_y, angles, powers, gravity_objects, black_holes,
+                   width, height, steps=200, field=None):
+    """Fly many shots at once like simulate_shots, recording where they go.
+
+    Nothing stops at a target, so the paths can be scored against any
+    target later (score_paths). Returns (xs, ys, captured): xs and ys are
+    (steps, n) arrays of the position after each step, NaN once a shot has
+    stopped, and captured marks the shots that fell into a black hole.
+    """
+    return _drain(fly_paths(origin_x, origin_y, angles, powers, gravity_objects, black_holes,
+                            width, height, steps, field))
+
+
+def fly_paths(origin_x, origin_y, angles, powers, gravity_objects, black_holes,
+              width, height, steps=200, field=None):
+    """simulate_paths() one frame of flight at a time: yields after each step, returns the paths"""
+    angle_rad = np.radians(np.asarray(angles, dtype=float))
+    power = np.asarray(powers, dtype=float)
+    cos = np.cos(angle_rad)
+    sin = np.sin(angle_rad)
+    x = origin_x + cos * 35
+    y = origin_y + sin * 35
+    vx = cos * power
+    vy = sin * power
+
+    n = len(x)
+    xs = np.full((steps, n), np.nan)
+    ys = np.full((steps, n), np.nan)
+    captured = np.zeros(n, dtype=bool)
+    flying = np.ones(n, dtype=bool)
+
+    planets = [(obj.x, obj.y, PLANET_G * obj.mass) for obj in gravity_objects]
+    holes = [(bh.x, bh.y, BLACK_HOLE_G * bh.mass, bh.event_horizon) for bh in black_holes]
+
+    for step in range(steps):
+        if not flying.any():
+            break
+
+        # Same operations in the same order as simulate_shots
+        idx = np.flatnonzero(flying)
+        cx, cy, cvx, cvy = x[idx], y[idx], vx[idx], vy[idx]
+
+        if field is not None:
+            fx, fy = field.sample_many(cx, cy)
+            cvx += fx
+            cvy += fy
+        else:
+            for bx, by, gm in planets:
+                fx, fy = _gravity_force(bx, by, gm, cx, cy)
+                cvx += fx
+                cvy += fy
+
+        alive = np.ones(len(idx), dtype=bool)
+        for bx, by, gm, horizon in holes:
+            if field is None:
+                fx, fy = _gravity_force(bx, by, gm, cx, cy)
+                cvx += fx
+                cvy += fy
+            dx = cx - bx
+            dy = cy - by
+            alive &= dx*dx + dy*dy >= horizon * horizon
+
+        captured[idx[~alive]] = True
+        flying[idx[~alive]] = False
+
+        idx = idx[alive]
+        cx = cx[alive] + cvx[alive]
+        cy = cy[alive] + cvy[alive]
+        x[idx] = cx
+        y[idx] = cy
+        vx[idx] = cvx[alive]
+        vy[idx] = cvy[alive]
+        xs[step, idx] = cx
+        ys[step, idx] = cy
+
+        out = (cx < 0) | (cx > width) | (cy < 0) | (cy > height)
+        flying[idx[out]] = False
+        yield
+
+    return xs, ys, captured
+
+
+def score_paths(xs, ys, captured, target_x, target_y, hit_radius=30):
+    """simulate_shots' scores for paths from simulate_paths, against this target"""
+    if not len(xs):
+        return np.full(xs.shape[1], np.inf)  # Every shot captured on its first step
+    dx = xs - target_x
+    dy = ys - target_y
+    dist = np.sqrt(dx*dx + dy*dy)
+    cols = np.arange(dist.shape[1])
+    # The flight ends at the first point within hit_radius
+    hit = dist < hit_radius
+    first = hit.argmax(axis=0)
+    scores = np.where(hit[first, cols], dist[first, cols], np.inf)
+    missed = ~hit[first, cols] & ~captured
+    if missed.any():
+        closest = np.fmin.reduce(dist[:, missed], axis=0)
+        scores[missed] = np.where(np.isnan(closest), np.inf, closest)
+    return scores
+
+
+class TrajectoryCache:
+    """LRU of simulated flight paths for the map being played.
+
+    A shot's path only depends on the map and where and how it is
+    launched, not on where the target is, so scores() keys paths on the
+    launch origin (quantized to origin_step pixels), angle and power
+    (angle_step degrees, power_step) and scores them against the target it
+    is given. Only the paths it hasn't seen are simulated, in one batch; a
+    CPU pad that wasn't moved since its last turn gets most of its search
+    for free. Paths belong to one map_key at a time and a new key (a new
+    Match from reset_game) empties the cache. hits and misses count paths.
+    """
+
+    def __init__(self, max_entries=4096, origin_step=1.0, angle_step=0.001, power_step=0.001):
+        self.max_entries = max_entries
+        self.origin_step = origin_step
+        self.angle_step = angle_step
+        self.power_step = power_step
+        self.map_key = None
+        self.paths = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def scores(self, map_key, origin_x, origin_y, target_x, target_y, angles, powers,
+               gravity_objects, black_holes, width, height, field=None):
+        """simulate_shots() for these shots, simulating only the uncached ones"""
+        return _drain(self.fly(map_key, origin_x, origin_y, target_x, target_y, angles, powers,
+                               gravity_objects, black_holes, width, height, field))
+
+    def fly(self, map_key, origin_x, origin_y, target_x, target_y, angles, powers,
+            gravity_objects, black_holes, width, height, field=None):
+        """scores() one frame of flight at a time, like fly_shots()"""
+        if map_key != self.map_key:
+            self.paths.clear()
+            self.map_key = map_key
+        origin = (round(origin_x / self.origin_step), round(origin_y / self.origin_step))
+        keys = [origin + (round(angle / self.angle_step), round(power / self.power_step))
+                for angle, power in zip(angles.tolist(), powers.tolist())]
+
+        paths = [self.paths.get(key) for key in keys]
+        missing = [i for i, path in enumerate(paths) if path is None]
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+        for key, path in zip(keys, paths):
+            if path is not None:
+                self.paths.move_to_end(key)
+        if missing:
+            xs, ys, captured = yield from fly_paths(origin_x, origin_y, angles[missing],
+                                                    powers[missing], gravity_objects, black_holes,
+                                                    width, height, field=field)
+            # Stored without the NaN tail
+            lengths = (~np.isnan(xs)).sum(axis=0)
+            for column, i in enumerate(missing):
+                length = lengths[column]
+                paths[i] = (xs[:length, column].copy(), ys[:length, column].copy(),
+                            bool(captured[column]))
+                self.paths[keys[i]] = paths[i]
+            while len(self.paths) > self.max_entries:
+                self.paths.popitem(last=False)
+
+        longest = max(len(path[0]) for path in paths)
+        xs = np.full((longest, len(paths)), np.nan)
+        ys = np.full((longest, len(paths)), np.nan)
+        for column, (path_x, path_y, _) in enumerate(paths):
+            xs[:len(path_x), column] = path_x
+            ys[:len(path_y), column] = path_y
+        captured = np.array([path[2] for path in paths], dtype=bool)
+        return score_paths(xs, ys, captured, target_x, target_y)
+
+    def clear(self):
+        self.paths.clear()
+        self.map_key = None
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.paths)}
+
+
+trajectory_cache = TrajectoryCache()
+
+
+def shot_grid(angle_start, angle_stop, angle_step, power_start, power_stop, power_step):
+    """Flattened angle-major (angle, power) candidates for simulate_shots"""
+    angles = np.arange(angle_start, angle_stop, angle_step, dtype=float)
+    powers = np.arange(power_start, power_stop, power_step, dtype=float)
+    grid_angles, grid_powers = np.meshgrid(angles, powers, indexing='ij')
+    return grid_angles.ravel(), grid_powers.ravel()
+
+
+class ShotSearch:
+    """Coarse-to-fine search for the shot passing closest to the target.
+
+    A coarse sweep scores a grid of angle_step degrees by power_levels
+    powers, then the `seeds` best cells that aren't next to a better one
+    (separate gravity-assist lines rather than one line's neighbours) are
+    refined together: each round scores a (2 * reach + 1)^2 stencil around
+    every seed, moves each seed to its best point and divides the stencil
+    spacing by shrink, until the angle spacing is below min_angle_step or
+    the next round would take simulations past budget. The score is the
+    closest approach, so refinement keeps improving shots that already hit.
+
+    The search runs as batches of simulate_shots() (the sweep, then a
+    round). A batch costs about the same whatever its size, so rounds score
+    every seed's stencil at once rather than one point at a time like
+    Nelder-Mead would. step() runs the next batch; step(deadline) instead
+    flies batches a frame of flight at a time until time.perf_counter()
+    reaches deadline, picking up where it stopped on the next call, so a
+    caller can give the search a slice of each frame. Either way the search
+    ends on the same shot. With a map_key, shots are scored through
+    trajectory_cache, so paths simulated on an earlier turn from the same
+    spot are reused. evaluated counts the shots scored so far (the budget
+    is on these, so the cache never changes the result, and the sweep is
+    thinned to fit a budget smaller than its grid) and simulations the ones
+    actually flown.
+    """
+
+    def __init__(self, origin_x, origin_y, target_x, target_y, gravity_objects, black_holes,
+                 width, height, budget=480, angle_range=(-180, 180), power_range=(8, 20),
+                 angle_step=10, power_levels=4, seeds=4, reach=2, shrink=3,
+                 min_angle_step=0.05, field=None, map_key=None):
+        self.shot = (origin_x, origin_y, target_x, target_y)
+        self.map_key = map_key
+        self.bodies = (gravity_objects, black_holes)
+        self.size = (width, height)
+        self.field = field
+        self.budget = budget
+        self.angle_range = angle_range
+        self.power_range = power_range
+        power_levels = max(1, min(power_levels, budget))
+        angle_count = max(1, min(round((angle_range[1] - angle_range[0]) / angle_step),
+                                 budget // power_levels))
+        self.grid = (angle_count, power_levels)
+        self.angle_step = (angle_range[1] - angle_range[0]) / angle_count
+        self.power_step = (power_range[1] - power_range[0]) / power_levels
+        self.seeds = seeds
+        self.shrink = shrink
+        self.min_angle_step = min_angle_step
+        offsets = np.arange(-reach, reach + 1, dtype=float)
+        stencil_a, stencil_p = (grid.ravel() for grid in np.meshgrid(offsets, offsets, indexing='ij'))
+        keep = (stencil_a != 0) | (stencil_p != 0)
+        self.stencil = (stencil_a[keep], stencil_p[keep])
+        self.evaluated = 0
+        self.simulations = 0
+        self.done = False
+        # Seeds being refined, as (angles, powers, scores) arrays; None before the sweep
+        self.best = None
+        self._batch = None  # The sweep or round in progress, as a generator
+
+    def _score(self, angles, powers):
+        """Generator flying these shots a frame at a time, returning their scores"""
+        self.evaluated += len(angles)
+        if self.map_key is None:
+            self.simulations += len(angles)
+            return (yield from fly_shots(*self.shot, angles, powers, *self.bodies, *self.size,
+                                         field=self.field))
+        misses = trajectory_cache.misses
+        scores = yield from trajectory_cache.fly(self.map_key, *self.shot, angles, powers,
+                                                 *self.bodies, *self.size, field=self.field)
+        self.simulations += trajectory_cache.misses - misses
+        return scores
+
+    def step(self, deadline=None):
+        """Run the next batch of simulations, or batches until deadline (nothing once done)"""
+        while not self.done:
+            if self._batch is None:
+                self._batch = self._sweep() if self.best is None else self._refine()
+                if self._batch is None:
+                    return
+            try:
+                while True:
+                    next(self._batch)
+                    if deadline is not None and time.perf_counter() >= deadline:
+                        return
+            except StopIteration:
+                self._batch = None
+            if deadline is None:
+                return
+
+    def _sweep(self):
+        angle_count, power_levels = self.grid
+        power_start = self.power_range[0]
+        angles = np.repeat(self.angle_range[0] + (np.arange(angle_count) + 0.5) * self.angle_step,
+                           power_levels)
+        powers = np.tile(power_start + (np.arange(power_levels) + 0.5) * self.power_step,
+                         angle_count)
+        scores = yield from self._score(angles, powers)
+
+        # The best cells with no better cell around them
+        cells = scores.reshape(self.grid)
+        starts = []
+        for flat in np.argsort(scores, kind='stable'):
+            if len(starts) == self.seeds or not np.isfinite(scores[flat]):
+                break
+            a, p = divmod(int(flat), power_levels)
+            if scores[flat] <= cells[max(a - 1, 0):a + 2, max(p - 1, 0):p + 2].min():
+                starts.append(flat)
+        if not starts:
+            # Nothing but black holes: settle for the least bad cell
+            starts = [int(scores.argmin())]
+            self.done = True
+        self.best = (angles[starts], powers[starts], scores[starts])
+        self.steps = (self.angle_step / self.shrink, self.power_step / self.shrink)
+
+    def _refine(self):
+        """The next round as a generator, or None (and done) once there is none"""
+        room = (self.budget - self.evaluated) // len(self.stencil[0])
+        if self.steps[0] < self.min_angle_step or room <= 0:
+            self.done = True
+            return None
+        # Out of budget for every seed: refine the most promising ones
+        return self._round(np.argsort(self.best[2], kind='stable')[:room])
+
+    def _round(self, order):
+        step_a, step_p = self.steps
+        stencil_a, stencil_p = self.stencil
+        angles, powers, scores = (values[order] for values in self.best)
+
+        trial_angles = angles[:, None] + stencil_a * step_a
+        trial_powers = np.clip(powers[:, None] + stencil_p * step_p, *self.power_range)
+        trial = yield from self._score(trial_angles.ravel(), trial_powers.ravel())
+        trial = trial.reshape(trial_angles.shape)
+
+        rows = np.arange(len(order))
+        pick = trial.argmin(axis=1)
+        better = trial[rows, pick] < scores
+        self.best = (np.where(better, trial_angles[rows, pick], angles),
+                     np.where(better, trial_powers[rows, pick], powers),
+                     np.where(better, trial[rows, pick], scores))
+        self.steps = (step_a / self.shrink, step_p / self.shrink)
+
+    def result(self):
+        """(score, angle, power) of the best shot found so far"""
+        angles, powers, scores = self.best
+        best = int(scores.argmin())
+        return float(scores[best]), float(angles[best]), float(powers[best])
+
+
+def search_shot(*args, **kwargs):
+    """Run a ShotSearch to the end: (score, angle, power, simulations)"""
+    search = ShotSearch(*args, **kwargs)
+    while not search.done:
+        search.step()
+    return search.result() + (search.simulations,)
@@ -0,0 +1,209 @@
+"""Map object placement by Poisson-disk sampling.
+
+Every object on the map has a kind ("planet", "black_hole", "asteroid",
+"pad", "rock") and each pair of kinds has a minimum centre-to-centre
+separation. Placer keeps everything placed so far in background grids, one
+per kind sized to that kind's spacing, so checking a candidate only looks at
+the few nearby cells. place() throws random darts while the map is sparse
+and, when they stop landing, fills the rest of the region with Bridson's
+Poisson-disk growth to find the spots that are left. The count is either
+placed in full or PlacementError is raised; nothing is silently dropped.
+"""
+import math
+import random
+
+# Minimum separations between kinds, in pixels (pairs not listed may overlap)
+SEPARATIONS = {
+    ('planet', 'planet'): 250,
+    ('black_hole', 'planet'): 300,
+    ('black_hole', 'black_hole'): 300,
+    ('black_hole', 'pad'): 250,
+    ('asteroid', 'asteroid'): 150,
+    ('asteroid', 'planet'): 150,
+    ('asteroid', 'black_hole'): 150,
+    ('asteroid', 'pad'): 150,
+    # Small gravitating rocks of the belt and galaxy maps
+    ('rock', 'rock'): 24,
+    ('planet', 'rock'): 80,
+    ('black_hole', 'rock'): 100,
+    ('pad', 'rock'): 150,
+    ('asteroid', 'rock'): 60,
+}
+
+
+class PlacementError(Exception):
+    """The requested objects don't fit in their region"""
+
+
+def separation(kind_a, kind_b, separations=SEPARATIONS):
+    return separations.get((kind_a, kind_b)) or separations.get((kind_b, kind_a)) or 0
+
+
+class _PointGrid:
+    """Points bucketed on a square grid for neighbourhood queries"""
+
+    def __init__(self, cell):
+        self.cell = cell
+        self.cells = {}
+        self.points = []
+
+    def add(self, x, y):
+        key = (int(x // self.cell), int(y // self.cell))
+        self.cells.setdefault(key, []).append((x, y))
+        self.points.append((x, y))
+
+    def conflicts(self, x, y, min_dist):
+        """True if a point is closer than min_dist to (x, y)"""
+        reach = int(math.ceil(min_dist / self.cell))
+        limit = min_dist * min_dist
+        if len(self.points) <= (2 * reach + 1)**2:
+            # Fewer points than cells to look in
+            for px, py in self.points:
+                if (px - x)**2 + (py - y)**2 < limit:
+                    return True
+            return False
+
+        ci = int(x // self.cell)
+        cj = int(y // self.cell)
+        cells = self.cells
+        for i in range(ci - reach, ci + reach + 1):
+            for j in range(cj - reach, cj + reach + 1):
+                for px, py in cells.get((i, j), ()):
+                    if (px - x)**2 + (py - y)**2 < limit:
+                        return True
+        return False
+
+
+class Placer:
+    """Everything placed on one map, for checking new candidates against"""
+
+    def __init__(self, separations=SEPARATIONS):
+        self.separations = separations
+        self.grids = {}
+        self.count = 0
+
+    def _cell(self, kind):
+        # No wider than the kind's tightest separation / sqrt 2, so a cell
+        # holds at most a point or two and a query scans few cells
+        spacings = [d for pair, d in self.separations.items() if kind in pair and d > 0]
+        return min(spacings) / math.sqrt(2) if spacings else 100
+
+    def _grid(self, kind):
+        grid = self.grids.get(kind)
+        if grid is None:
+            grid = self.grids[kind] = _PointGrid(self._cell(kind))
+        return grid
+
+    def add(self, x, y, kind):
+        self._grid(kind).add(x, y)
+        self.count += 1
+
+    def add_objects(self, objects, kind):
+        for obj in objects:
+            self.add(obj.x, obj.y, kind)
+
+    def _checks(self, kind):
+        """(grid, separation) for every placed kind a new `kind` must keep clear of"""
+        checks = []
+        for other, grid in self.grids.items():
+            d = separation(kind, other, self.separations)
+            if d:
+                checks.append((grid, d))
+        return checks
+
+    def fits(self, x, y, kind):
+        return not any(grid.conflicts(x, y, d) for grid, d in self._checks(kind))
+
+    def place(self, kind, count, region, rng=random, candidates=20, attempts=10, inside=None):
+        """count integer (x, y) positions for kind inside region = (x0, y0, x1, y1).
+
+        inside(x, y) can narrow the rectangle to any shape (a ring, a band).
+        Random darts are tried first, which is quick and evenly spread while
+        the map is sparse. If some don't land, the rest of the region is
+        filled by Poisson-disk growth from the points found so far and the
+        missing ones are drawn from that. An unlucky early layout can block
+        a tight fit, so the search starts over up to attempts times. The
+        chosen positions are added to the placer; raises PlacementError if
+        fewer than count fit.
+        """
+        if count <= 0:
+            return []
+        best = 0
+        for _ in range(attempts):
+            sample = self._sample(kind, count, region, rng, candidates, inside)
+            if len(sample) >= count:
+                for x, y in sample:
+                    self.add(x, y, kind)
+                return sample
+            best = max(best, len(sample))
+        raise PlacementError(f"only {best} of {count} {kind} positions fit in {region}")
+
+    def _sample(self, kind, count, region, rng, candidates, inside):
+        """Up to count positions (fewer if the region fills up first)"""
+        x0, y0, x1, y1 = region
+        spacing = separation(kind, kind, self.separations)
+        # Kinds that may touch each other still grow the sample at a sensible density
+        step = spacing or self._cell(kind)
+        checks = self._checks(kind)
+
+        sample = []
+        sample_grid = _PointGrid(self._cell(kind))
+
+        def accept(x, y):
+            if not (x0 <= x <= x1 and y0 <= y <= y1):
+                return False
+            if inside and not inside(x, y):
+                return False
+            for grid, d in checks:
+                if grid.conflicts(x, y, d):
+                    return False
+            if spacing and sample_grid.conflicts(x, y, spacing):
+                return False
+            sample.append((x, y))
+            sample_grid.add(x, y)
+            return True
+
+        def dart():
+            for _ in range(candidates):
+                if accept(rng.randint(int(x0), int(x1)), rng.randint(int(y0), int(y1))):
+                    return True
+            return False
+
+        # Random sequential darts
+        while len(sample) < count and dart():
+            pass
+        if len(sample) >= count:
+            return sample
+
+        # Bridson growth over the rest of the region
+        darts = len(sample)
+        active = list(sample)
+        while True:
+            if not spacing and len(sample) >= count:
+                # Points that may overlap never crowd each other out, so
+                # the growth would only stop when the darts happened to miss
+                break
+            if not active:
+                # Re-seed any disconnected part of the region
+                if not dart():
+                    break
+                active.append(sample[-1])
+                continue
+
+            i = rng.randrange(len(active))
+            ax, ay = active[i]
+            for _ in range(candidates):
+                angle = rng.uniform(0, 2 * math.pi)
+                dist = rng.uniform(step, 2 * step)
+                if accept(int(round(ax + math.cos(angle) * dist)),
+                          int(round(ay + math.sin(angle) * dist))):
+                    active.append(sample[-1])
+                    break
+            else:
+                # Nothing fits around this point any more
+                active[i] = active[-1]
+                active.pop()
+
+        if len(sample) < count:
+            return sample
+        return sample[:darts] + rng.sample(sample[darts:], count - darts)
@@ -0,0 +1,126 @@
+"""Predicted flight path for the shot being aimed.
+
+TrajectoryPreview flies a stand-in missile with Missile.update, so the
+path is what firing now would do (gravity, black holes and the screen
+edge; asteroids and pads aside). Paths are kept in an LRU keyed on the map,
+the pad position and the aim quantized to angle_step / power_step, and
+grow a few frames at a time within a time budget: the first frames show
+at once and the rest of the horizon fills in over the next frames, so
+dragging the mouse never stalls a frame and going back to an aim already
+tried costs nothing. A cached path flown from a slightly different aim in
+the same bucket is shown straight away while the exact one catches up and
+replaces it, so the preview settles on the true path once the aim stops.
+"""
+import math
+import time
+from array import array
+from collections import OrderedDict
+
+from core import Missile
+
+
+class _Path:
+    __slots__ = ('angle', 'power', 'missile', 'points', 'frames', 'done', 'successor')
+
+    def __init__(self, angle, power, missile):
+        self.angle = angle
+        self.power = power
+        self.missile = missile
+        self.points = array('f', (missile.x, missile.y))  # Flat x, y per frame
+        self.frames = 0
+        self.done = False
+        self.successor = None  # The exact path replacing this one
+
+
+class TrajectoryPreview:
+    """LRU of predicted paths, extended within budget seconds per call.
+
+    Every call to path() flies at least min_frames more (so a slow map
+    still shows something) and then stops at the budget or the horizon;
+    the exact path refining a nearby one shares that allowance and deadline.
+    hits, misses and frames count the work for tuning.
+    """
+
+    def __init__(self, horizon=240, budget=0.002, min_frames=20, max_entries=256,
+                 angle_step=0.1, power_step=0.05):
+        self.horizon = horizon
+        self.budget = budget
+        self.min_frames = min_frames
+        self.max_entries = max_entries
+        self.angle_step = angle_step
+        self.power_step = power_step
+        self.paths = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.frames = 0
+
+    def key(self, match, pad):
+        return (match.map_id, pad.x, pad.y,
+                round(pad.angle / self.angle_step), round(pad.power / self.power_step))
+
+    def path(self, match, field=None):
+        """Flat x, y array of the current pad's predicted path as far as it is known"""
+        pad = match.current
+        deadline = time.perf_counter() + self.budget
+        key = self.key(match, pad)
+        path = self.paths.get(key)
+        if path is None:
+            self.misses += 1
+            path = self.paths[key] = self._start(pad)
+            if len(self.paths) > self.max_entries:
+                self.paths.popitem(last=False)
+        else:
+            self.hits += 1
+            self.paths.move_to_end(key)
+
+        min_frames = self.min_frames
+        if path.angle != pad.angle or path.power != pad.power:
+            # Close enough to show, but refine towards the exact aim
+            successor = path.successor
+            if successor is None or successor.angle != pad.angle or successor.power != pad.power:
+                successor = path.successor = self._start(pad)
+            min_frames -= self._extend(successor, match, field, deadline, min_frames)
+            if not (successor.done or successor.frames >= path.frames):
+                return path.points
+            path = self.paths[key] = successor
+
+        if not path.done:
+            self._extend(path, match, field, deadline, max(min_frames, 0))
+        return path.points
+
+    def _start(self, pad):
+        # Launched like LaunchPad.fire(), outside the missile pool
+        angle_rad = math.radians(pad.angle)
+        missile = Missile(pad.x + math.cos(angle_rad) * 35, pad.y + math.sin(angle_rad) * 35,
+                          math.cos(angle_rad) * pad.power, math.sin(angle_rad) * pad.power,
+                          pad.color)
+        return _Path(pad.angle, pad.power, missile)
+
+    def _extend(self, path, match, field, deadline, min_frames):
+        """Fly path on until the horizon or, past min_frames, the deadline; returns frames flown"""
+        missile = path.missile
+        points = path.points
+        flown = 0
+        while path.frames < self.horizon:
+            if flown >= min_frames and time.perf_counter() > deadline:
+                break
+            missile.update(match.gravity_objects, match.black_holes, field, match.integrator)
+            path.frames += 1
+            flown += 1
+            if missile.active:
+                points.append(missile.x)
+                points.append(missile.y)
+            else:
+                # Off the screen or into a black hole
+                path.done = True
+                break
+        else:
+            path.done = True
+        self.frames += flown
+        return flown
+
+    def clear(self):
+        self.paths.clear()
+        self.hits = 0
+        self.misses = 0
+        self.frames = 0
@@ -0,0 +1,120 @@
+"""Per-frame phase timings for the game loop.
+
+The loop calls begin_frame() once a frame and switch(name) whenever it
+moves on to another phase (events, cpu, physics, collisions, draw...), so
+each boundary costs one clock read. Match.update reports its own phases and
+counters when match.profiler is set; with no profiler attached the only
+cost is a None check. The last `capacity` frames are kept in a ring buffer
+for the overlay (summary()) and for export as Chrome trace-event JSON
+(load it in chrome://tracing or https://ui.perfetto.dev).
+"""
+import json
+import time
+
+
+class _Frame:
+    __slots__ = ('start', 'end', 'marks', 'counters')
+
+    def __init__(self):
+        self.start = 0.0
+        self.end = 0.0
+        self.marks = []  # (phase, start time); each phase ends where the next begins
+        self.counters = {}
+
+
+class FrameProfiler:
+    """Ring buffer of the last capacity frames, each a list of phases and counters"""
+
+    def __init__(self, capacity=600):
+        self.capacity = capacity
+        self.frames = [_Frame() for _ in range(capacity)]
+        self.count = 0  # Frames begun so far
+        self.current = None
+        self.origin = time.perf_counter()
+
+    def begin_frame(self, phase="events"):
+        now = time.perf_counter()
+        if self.current:
+            self.current.end = now
+        frame = self.frames[self.count % self.capacity]
+        frame.start = now
+        frame.end = 0.0
+        frame.marks.clear()
+        frame.counters.clear()
+        frame.marks.append((phase, now))
+        self.current = frame
+        self.count += 1
+
+    def end_frame(self):
+        """Finish the running frame without starting another (recording paused)"""
+        if self.current:
+            self.current.end = time.perf_counter()
+            self.current = None
+
+    def switch(self, phase):
+        """End the running phase and start phase"""
+        if self.current:
+            self.current.marks.append((phase, time.perf_counter()))
+
+    def count_add(self, name, amount):
+        if self.current:
+            counters = self.current.counters
+            counters[name] = counters.get(name, 0) + amount
+
+    def recent(self, frames=None):
+        """Finished frames, oldest first (at most frames of them)"""
+        stored = min(self.count, self.capacity)
+        order = [self.frames[(self.count - stored + i) % self.capacity] for i in range(stored)]
+        finished = [frame for frame in order if frame.end]
+        return finished[-frames:] if frames else finished
+
+    @staticmethod
+    def phases(frame):
+        """(phase, start, seconds) for each phase of a finished frame"""
+        marks = frame.marks
+        spans = []
+        for i, (phase, start) in enumerate(marks):
+            end = marks[i + 1][1] if i + 1 < len(marks) else frame.end
+            spans.append((phase, start, end - start))
+        return spans
+
+    def summary(self, frames=60):
+        """Mean ms per phase, fps and mean counters over the last frames"""
+        recent = self.recent(frames)
+        if not recent:
+            return {'fps': 0.0, 'frame_ms': 0.0, 'phases': {}, 'counters': {}}
+        phase_ms = {}
+        counters = {}
+        for frame in recent:
+            for phase, _, seconds in self.phases(frame):
+                phase_ms[phase] = phase_ms.get(phase, 0.0) + seconds * 1000
+            for name, value in frame.counters.items():
+                counters[name] = counters.get(name, 0) + value
+        n = len(recent)
+        frame_s = sum(frame.end - frame.start for frame in recent) / n
+        return {
+            'fps': 1 / frame_s if frame_s else 0.0,
+            'frame_ms': frame_s * 1000,
+            'phases': {phase: ms / n for phase, ms in phase_ms.items()},
+            'counters': {name: value / n for name, value in counters.items()},
+        }
+
+    def trace_events(self):
+        """The buffer as Chrome trace events: one complete event per phase, counters per frame"""
+        events = []
+        for number, frame in enumerate(self.recent()):
+            ts = (frame.start - self.origin) * 1e6
+            events.append({'name': 'frame', 'ph': 'X', 'pid': 1, 'tid': 1, 'ts': ts,
+                           'dur': (frame.end - frame.start) * 1e6, 'args': {'frame': number}})
+            for phase, start, seconds in self.phases(frame):
+                events.append({'name': phase, 'ph': 'X', 'pid': 1, 'tid': 1,
+                               'ts': (start - self.origin) * 1e6, 'dur': seconds * 1e6})
+            if frame.counters:
+                events.append({'name': 'counters', 'ph': 'C', 'pid': 1, 'ts': ts,
+                               'args': dict(frame.counters)})
+        return events
+
+    def write_trace(self, path):
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': self.trace_events(), 'displayTimeUnit': 'ms'}, f)
+        return path
@@ -0,0 +1,366 @@
+"""pygame drawing for the objects in core.py"""
+import math
+
+import pygame
+
+from core import (BLACK, GRAY, GREEN, HEIGHT, ORANGE, PURPLE, TRAIL_LENGTH, WHITE, WIDTH,
+                  YELLOW)
+from render_cache import (alpha_surface, asteroid_sprites, fade_palette, get_font, render_text,
+                          sprite_cache)
+
+# Missile trails fade from dark to full color in this many steps
+TRAIL_BANDS = 10
+
+def _planet_sprite(planet_type, radius):
+    """A planet with its gravity well rings, centered on the anchor"""
+    if planet_type == 'rock':
+        # Belt and galaxy rocks are too many and too light for gravity wells
+        c = radius + 1
+        surface = alpha_surface((2 * c + 1, 2 * c + 1))
+        pygame.draw.circle(surface, (120, 110, 100), (c, c), radius)
+        pygame.draw.circle(surface, (90, 80, 75), (c, c), radius, 1)
+        return surface, (c, c)
+
+    # Room for the outer well ring and Saturn's rings
+    c = max(radius + 41, radius * 2 + 2)
+    surface = alpha_surface((2 * c + 1, 2 * c + 1))
+
+    # Draw gravity well visualization (translucent on the per-pixel-alpha sprite)
+    for i in range(3):
+        alpha_radius = radius + i * 20
+        pygame.draw.circle(surface, (*PURPLE[:3], 30), (c, c), int(alpha_radius), 1)
+    
+    # Draw planet based on type
+    if planet_type == 'mars':
+        # Mars - Red planet
+        pygame.draw.circle(surface, (193, 68, 14), (c, c), radius)
+        pygame.draw.circle(surface, (150, 50, 10), (int(c - radius/3), int(c - radius/3)), int(radius/4))
+        pygame.draw.circle(surface, (170, 60, 12), (int(c + radius/4), int(c + radius/4)), int(radius/3))
+    
+    elif planet_type == 'jupiter':
+        # Jupiter - Orange with stripes
+        pygame.draw.circle(surface, (216, 146, 88), (c, c), radius)
+        # Bands
+        for i in range(-1, 1):
+            y_offset = i * radius / 3
+            pygame.draw.ellipse(surface, (180, 120, 70), 
+                              (c - radius, c + y_offset - 3, radius * 2, 6))
+        # Great Red Spot
+        pygame.draw.ellipse(surface, (200, 100, 80), 
+                          (c - radius/2, c, radius * 0.6, radius * 0.4))
+    
+    elif planet_type == 'saturn':
+        # Saturn - Pale yellow with rings
+        pygame.draw.circle(surface, (237, 221, 152), (c, c), radius)
+        pygame.draw.circle(surface, (220, 200, 130), (c, c), radius, 2)
+        # Rings
+        ring_width = radius * 4
+        ring_height = radius * 0.4
+        pygame.draw.ellipse(surface, (200, 180, 120), 
+                          (c - ring_width/2, c - ring_height/2, ring_width, ring_height), 3)
+        pygame.draw.ellipse(surface, (180, 160, 100), 
+                          (c - ring_width/2 + 4, c - ring_height/2 + 2, ring_width - 8, ring_height - 4), 2)
+    
+    elif planet_type == 'neptune':
+        # Neptune - Deep blue
+        pygame.draw.circle(surface, (62, 84, 232), (c, c), radius)
+        pygame.draw.circle(surface, (82, 104, 255), (int(c - radius/2), int(c - radius/4)), int(radius/3))
+        # Dark spot
+        pygame.draw.ellipse(surface, (40, 60, 180), 
+                          (c - radius/3, c, radius * 0.5, radius * 0.2))
+    
+    elif planet_type == 'uranus':
+        # Uranus - Cyan/turquoise
+        pygame.draw.circle(surface, (79, 208, 231), (c, c), radius)
+        pygame.draw.circle(surface, (100, 220, 240), (c, c), radius, 2)
+        # Faint bands
+        for i in range(0, 1):
+            y_offset = i * radius / 2
+            pygame.draw.line(surface, (60, 180, 200), 
+                           (c - radius, c + y_offset), 
+                           (c + radius, c + y_offset), 4)
+    
+    elif planet_type == 'venus':
+        # Venus - Pale yellow/white
+        pygame.draw.circle(surface, (255, 240, 200), (c, c), radius)
+        pygame.draw.circle(surface, (240, 220, 180), (c, c), radius, 2)
+        # Cloud patterns
+        pygame.draw.arc(surface, (230, 210, 170), 
+                      (c - radius, c - radius, radius * 2, radius * 2), 
+                      0, 3.14, 2)
+
+    return surface, (c, c)
+
+def draw_gravity_object(screen, obj):
+    radius = int(obj.radius)
+    surface, (ax, ay) = sprite_cache.get(('planet', obj.planet_type, radius),
+                                         lambda: _planet_sprite(obj.planet_type, radius))
+    screen.blit(surface, (int(obj.x) - ax, int(obj.y) - ay))
+
+def draw_black_hole(screen, bh):
+    # Draw accretion disk (swirling effect)
+    for i in range(5):
+        alpha_radius = bh.event_horizon + i * 15
+        color = (100 - i * 15, 0, 100 - i * 15)
+        pygame.draw.circle(screen, color, (int(bh.x), int(bh.y)), int(alpha_radius), 2)
+    
+    # Draw event horizon
+    pygame.draw.circle(screen, (50, 0, 50), (int(bh.x), int(bh.y)), bh.event_horizon, 3)
+    
+    # Draw black hole center
+    pygame.draw.circle(screen, BLACK, (int(bh.x), int(bh.y)), bh.radius)
+    pygame.draw.circle(screen, (20, 0, 20), (int(bh.x), int(bh.y)), bh.radius, 2)
+
+def _asteroid_sprite(asteroid):
+    """The asteroid's rocky outline and craters, anchored on int(x), int(y)"""
+    c = asteroid.radius + 3
+    surface = alpha_surface((2 * c + 1, 2 * c + 1))
+    # Shape in sprite pixels, keeping the position's fraction of a pixel
+    ox = int(asteroid.x) - c
+    oy = int(asteroid.y) - c
+    points = [(x - ox, y - oy) for x, y in asteroid.shape_points]
+    if len(points) > 2:
+        pygame.draw.polygon(surface, asteroid.color, points)
+        pygame.draw.polygon(surface, (100, 100, 100), points, 3)
+    
+    # Add some crater details
+    for i in range(2):
+        angle = math.pi
+        distance = asteroid.radius * i * .125 + 1
+        crater_x = int(asteroid.x + math.cos(angle) * distance) - ox
+        crater_y = int(asteroid.y + math.sin(angle) * distance) - oy
+        crater_size = 5
+        pygame.draw.circle(surface, (120, 120, 120), (crater_x, crater_y), crater_size)
+    return surface, (c, c)
+
+def draw_asteroid(screen, asteroid):
+    if not asteroid.destroyed:
+        # Keyed on the shape relative to the anchor: the same asteroid redrawn
+        # in a later frame (or a replay of it) finds its sprite again
+        x = int(asteroid.x)
+        y = int(asteroid.y)
+        key = (asteroid.radius, asteroid.color,
+               tuple((round(px - x, 2), round(py - y, 2)) for px, py in asteroid.shape_points))
+        surface, (ax, ay) = asteroid_sprites.get(key, lambda: _asteroid_sprite(asteroid))
+        screen.blit(surface, (x - ax, y - ay))
+
+def draw_missile(screen, missile, points=None):
+    """Trail and head; points is missile.trail.to_list() if the caller already has it"""
+    if points is None:
+        points = missile.trail.to_list()
+    # Draw trail, fading in TRAIL_BANDS runs of segments (one draw call each)
+    n = len(points)
+    if n > 1:
+        palette = fade_palette(missile.color, TRAIL_LENGTH)
+        band = -(-(n - 1) // TRAIL_BANDS)  # Segments per band, rounded up
+        for start in range(0, n - 1, band):
+            end = min(start + band, n - 1)
+            color = palette[start * TRAIL_LENGTH // n]
+            pygame.draw.lines(screen, color, False, points[start:end + 1], 2)
+    
+    # Draw missile
+    if missile.active:
+        pygame.draw.circle(screen, missile.color, (int(missile.x), int(missile.y)), 5)
+        
+        # Draw thrust effect if recently thrusted
+        if missile.thrust_cooldown > 5:
+            pygame.draw.circle(screen, ORANGE, (int(missile.x), int(missile.y)), 8, 2)
+
+def missile_bounds(missile, points=None):
+    """Screen area covered by draw_missile() (trail plus head), for dirty rects"""
+    if points is None:
+        points = missile.trail.to_list()
+    xs = [x for x, y in points]
+    ys = [y for x, y in points]
+    if missile.active:
+        xs.append(int(missile.x))
+        ys.append(int(missile.y))
+    if not xs:
+        return None
+    return pygame.Rect(min(xs) - 9, min(ys) - 9, max(xs) - min(xs) + 19, max(ys) - min(ys) + 19)
+
+def draw_trajectory_preview(screen, points, color, spacing=4):
+    """Dots every spacing frames along a predicted path (flat x, y array, see preview.py)"""
+    for i in range(2 * spacing, len(points) - 1, 2 * spacing):
+        pygame.draw.circle(screen, color, (int(points[i]), int(points[i + 1])), 2)
+
+def preview_bounds(points):
+    """Screen area covered by draw_trajectory_preview(), for dirty rects"""
+    if len(points) < 2:
+        return None
+    xs = points[0::2]
+    ys = points[1::2]
+    return pygame.Rect(min(xs) - 3, min(ys) - 3, max(xs) - min(xs) + 7, max(ys) - min(ys) + 7)
+
+def _saucer_sprite(color):
+    """A launch pad's flying saucer without its cannon, anchored on the pad position"""
+    surface = alpha_surface((63, 38))
+    x, y = 31, 26
+    # Bottom dome
+    pygame.draw.ellipse(surface, color, (x - 25, y - 5, 50, 15))
+    pygame.draw.ellipse(surface, tuple(max(0, c - 50) for c in color), (x - 25, y - 5, 50, 15), 2)
+    
+    # Middle disk (main body)
+    pygame.draw.ellipse(surface, color, (x - 30, y - 15, 60, 20))
+    pygame.draw.ellipse(surface, tuple(min(255, c + 50) for c in color), (x - 30, y - 15, 60, 20), 2)
+    
+    # Top dome (cockpit)
+    pygame.draw.ellipse(surface, tuple(min(255, c + 80) for c in color), (x - 15, y - 25, 30, 15))
+    pygame.draw.ellipse(surface, WHITE, (x - 15, y - 25, 30, 15), 1)
+    
+    # Windows/lights
+    pygame.draw.circle(surface, YELLOW, (x - 15, y - 5), 3)
+    pygame.draw.circle(surface, YELLOW, (x, y - 5), 3)
+    pygame.draw.circle(surface, YELLOW, (x + 15, y - 5), 3)
+    return surface, (x, y)
+
+_beam_colors = {}
+
+def _beam_color(color):
+    """Cannon color for a pad color, computed once per color"""
+    beam = _beam_colors.get(color)
+    if beam is None:
+        beam = _beam_colors[color] = tuple(min(255, c + 100) for c in color)
+    return beam
+
+def draw_launch_pad(screen, pad, is_active):
+    if pad.destroyed:
+        return  # Don't draw if destroyed
+    
+    # Draw health bar
+    bar_width = 60
+    bar_height = 8
+    health_width = int(bar_width * (pad.health / 100))
+    pygame.draw.rect(screen, GRAY, (pad.x - bar_width//2, pad.y - 50, bar_width, bar_height))
+    pygame.draw.rect(screen, pad.color, (pad.x - bar_width//2, pad.y - 50, health_width, bar_height))
+    
+    # Draw flying saucer (pre-rendered once per color)
+    surface, (ax, ay) = sprite_cache.get(('saucer', pad.color), lambda: _saucer_sprite(pad.color))
+    screen.blit(surface, (int(pad.x) - ax, int(pad.y) - ay))
+    
+    # Draw cannon (energy beam emitter)
+    angle_rad = math.radians(pad.angle)
+    cannon_start_x = pad.x + math.cos(angle_rad) * 15
+    cannon_start_y = pad.y + math.sin(angle_rad) * 10
+    end_x = pad.x + math.cos(angle_rad) * 40
+    end_y = pad.y + math.sin(angle_rad) * 40
+    
+    # Beam emitter
+    pygame.draw.line(screen, _beam_color(pad.color), 
+                    (cannon_start_x, cannon_start_y), (end_x, end_y), 4)
+    pygame.draw.circle(screen, YELLOW, (int(end_x), int(end_y)), 4)
+    
+    # Draw power indicator if active
+    if is_active:
+        power_length = pad.power * 5
+        power_x = pad.x + math.cos(angle_rad) * (40 + power_length)
+        power_y = pad.y + math.sin(angle_rad) * (40 + power_length)
+        pygame.draw.line(screen, YELLOW, (end_x, end_y), (power_x, power_y), 3)
+        # Pulsing effect
+        pygame.draw.circle(screen, YELLOW, (int(power_x), int(power_y)), 6, 2)
+    
+    # Draw name
+    text = render_text(get_font(24), pad.name, WHITE)
+    screen.blit(text, (pad.x - text.get_width()//2, pad.y + 25))
+
+def pad_bounds(pad):
+    """Screen area covered by draw_launch_pad() (saucer, label, cannon and power line)"""
+    rect = pygame.Rect(pad.x - 80, pad.y - 55, 160, 105)
+    angle_rad = math.radians(pad.angle)
+    reach = 40 + pad.power * 5
+    tip_x = pad.x + math.cos(angle_rad) * reach
+    tip_y = pad.y + math.sin(angle_rad) * reach
+    return rect.union(pygame.Rect(tip_x - 8, tip_y - 8, 16, 16))
+
+def draw_shot_history(screen, shot_history):
+    # Draw previous shot trails (last shot from each player). They are flat
+    # x, y arrays (see core.simplify_trail), one polyline each, drawn only
+    # when the static layer is rebuilt
+    for player_id, shot in shot_history:
+        for trail, color in shot:
+            if len(trail) >= 4:
+                pygame.draw.lines(screen, color, False, list(zip(trail[0::2], trail[1::2])), 1)
+
+def draw_static_scene(screen, background, gravity_objects, black_holes, asteroids, shot_history):
+    """Everything that stays put for a whole turn (cached in the static layer)"""
+    if background:
+        screen.blit(background, (0, 0))
+    else:
+        screen.fill(BLACK)
+
+    # Draw gravity objects
+    for obj in gravity_objects:
+        draw_gravity_object(screen, obj)
+    
+    # Draw black holes
+    for bh in black_holes:
+        draw_black_hole(screen, bh)
+    
+    # Draw asteroids
+    for asteroid in asteroids:
+        draw_asteroid(screen, asteroid)
+
+    draw_shot_history(screen, shot_history)
+
+def draw_menu(screen, background, font_large, font_med, selected_option):
+    # Draw background
+    if background:
+        screen.blit(background, (0, 0))
+    else:
+        screen.fill(BLACK)
+
+    # Title
+    title = render_text(font_large, "GRAVITY MISSILES", YELLOW)
+    screen.blit(title, (WIDTH//2 - title.get_width()//2, 150))
+    
+    # Menu options
+    options = [
+        ("1. Player vs Player", WHITE if selected_option != 0 else GREEN),
+        ("2. Player vs CPU (Easy)", WHITE if selected_option != 1 else GREEN),
+        ("3. Player vs CPU (Medium)", WHITE if selected_option != 2 else GREEN),
+        ("4. Player vs CPU (Hard)", WHITE if selected_option != 3 else GREEN),
+        ("Q. Quit", WHITE if selected_option != 4 else GREEN)
+    ]
+    
+    y_pos = 300
+    for text, color in options:
+        option_text = render_text(font_med, text, color)
+        screen.blit(option_text, (WIDTH//2 - option_text.get_width()//2, y_pos))
+        y_pos += 60
+    
+    # Instructions
+    instructions = render_text(font_med, "Use Arrow Keys and Press Enter", GRAY)
+    screen.blit(instructions, (WIDTH//2 - instructions.get_width()//2, HEIGHT - 100))
+
+def draw_connecting(screen, background, font_med, font_small, message):
+    """The screen shown while a network match waits for the other player"""
+    if background:
+        screen.blit(background, (0, 0))
+    else:
+        screen.fill(BLACK)
+    text = render_text(font_med, message, WHITE)
+    screen.blit(text, (WIDTH//2 - text.get_width()//2, HEIGHT//2 - 40))
+    cancel = render_text(font_small, "ESC: Cancel", GRAY)
+    screen.blit(cancel, (WIDTH//2 - cancel.get_width()//2, HEIGHT//2 + 20))
+
+def profiler_overlay(summary, font):
+    """Panel with fps, ms per phase and the per-frame counters of a FrameProfiler summary.
+
+    Rendered straight from the font onto a new surface: the numbers change
+    every refresh and would only churn the shared text cache.
+    """
+    lines = [f"{summary['fps']:5.1f} fps  {summary['frame_ms']:6.2f} ms"]
+    for phase, ms in sorted(summary['phases'].items(), key=lambda item: -item[1]):
+        lines.append(f"{phase:<12}{ms:6.2f} ms")
+    for name, value in sorted(summary['counters'].items()):
+        lines.append(f"{name:<12}{value:8.0f}")
+    rows = [font.render(line, True, WHITE) for line in lines]
+    width = max(row.get_width() for row in rows) + 12
+    height = sum(row.get_height() for row in rows) + 10
+    panel = pygame.Surface((width, height), pygame.SRCALPHA)
+    panel.fill((0, 0, 0, 170))
+    y = 5
+    for row in rows:
+        panel.blit(row, (6, y))
+        y += row.get_height()
+    return panel
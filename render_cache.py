@@ -0,0 +1,198 @@
+from collections import OrderedDict
+
+import pygame
+
+
+class StaticLayer:
+    """Everything that only changes between turns, composited onto one surface.
+
+    The background, planets, black holes, asteroids and shot history are drawn
+    once and reused every frame as a single blit. refresh() redraws the layer
+    only when the set of objects (or an asteroid's destroyed flag) changes.
+    """
+
+    def __init__(self, size):
+        self.surface = pygame.Surface(size).convert()
+        self.key = None
+        self.sources = None
+        self.builds = 0
+
+    def invalidate(self):
+        """Rebuild on the next refresh() whatever the objects (new background...)"""
+        self.key = None
+
+    def refresh(self, gravity_objects, black_holes, asteroids, shot_history, draw):
+        """Call draw(surface) if the scene changed since the last build; True if it did"""
+        sources = (gravity_objects, black_holes, asteroids, shot_history)
+        key = (tuple(map(id, gravity_objects)), tuple(map(id, black_holes)),
+               tuple((id(asteroid), asteroid.destroyed) for asteroid in asteroids),
+               tuple(map(id, shot_history)))
+        if key == self.key:
+            return False
+
+        draw(self.surface)
+        self.key = key
+        # Keep the objects alive so their ids can't be reused while cached
+        self.sources = tuple(list(objs) for objs in sources)
+        self.builds += 1
+        return True
+
+
+class DirtyRectRenderer:
+    """Pushes only the parts of the screen that changed to the display.
+
+    Each frame the regions drawn last frame are restored from the static
+    layer, the dynamic objects are drawn and mark() their rects, and present()
+    updates last frame's rects plus this frame's. With dirty rects disabled (or
+    after invalidate()) the whole layer is blitted and the display flipped.
+    """
+
+    def __init__(self, screen, enabled=True):
+        self.screen = screen
+        self.enabled = enabled
+        self.full_redraw = True
+        self.previous = []
+        self.current = []
+
+    def invalidate(self):
+        """Force a full redraw next frame (new layer, state change...)"""
+        self.full_redraw = True
+
+    def restore(self, layer):
+        if self.full_redraw or not self.enabled:
+            self.screen.blit(layer, (0, 0))
+        else:
+            for rect in self.previous:
+                self.screen.blit(layer, rect, rect)
+
+    def mark(self, rect):
+        if rect:
+            self.current.append(rect)
+
+    def present(self):
+        if self.full_redraw or not self.enabled:
+            pygame.display.flip()
+            self.full_redraw = False
+        else:
+            pygame.display.update(self.previous + self.current)
+        self.previous = self.current
+        self.current = []
+
+
+class TextCache:
+    """LRU cache of rendered text surfaces keyed by (font, text, color).
+
+    Static strings are rasterized once; changing ones (like the fuel count)
+    only cost a render the first time each variant is seen. hits and misses
+    count lookups so the cache size can be tuned.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color):
+        key = (font, text, color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, True, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_entries:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+class SpriteCache:
+    """LRU cache of pre-rendered sprites keyed by what they show.
+
+    get(key, build) returns build()'s (surface, anchor) the first time a key
+    is seen and the same pair after that, so every planet of one type and
+    size (or every saucer of one color) shares one surface. anchor is the
+    pixel of the surface that goes on the object's position. hits and misses
+    count lookups like TextCache.
+    """
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self.sprites = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, build):
+        sprite = self.sprites.get(key)
+        if sprite is not None:
+            self.hits += 1
+            self.sprites.move_to_end(key)
+            return sprite
+
+        self.misses += 1
+        sprite = self.sprites[key] = build()
+        # Sprites are never drawn on again, so run-length encode them: mostly
+        # transparent ones (like the gravity wells) then blit several times faster
+        sprite[0].set_alpha(255, pygame.RLEACCEL)
+        if len(self.sprites) > self.max_entries:
+            self.sprites.popitem(last=False)
+        return sprite
+
+    def clear(self):
+        self.sprites.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+def alpha_surface(size):
+    """Transparent per-pixel-alpha surface, in the display's format once there is one"""
+    surface = pygame.Surface(size, pygame.SRCALPHA)
+    if pygame.display.get_surface():
+        surface = surface.convert_alpha()
+        surface.fill((0, 0, 0, 0))
+    return surface
+
+
+_fonts = {}
+
+
+def get_font(size, name=None):
+    """Shared pygame Font for (name, size), created on first use"""
+    key = (name, size)
+    font = _fonts.get(key)
+    if font is None:
+        font = _fonts[key] = pygame.font.Font(name, size)
+    return font
+
+
+text_cache = TextCache()
+sprite_cache = SpriteCache()
+# Every asteroid has its own random outline, so its sprite is only reused
+# while that asteroid is on the map; a few entries cover the current ones
+# without single-use surfaces pushing the shared sprites out of sprite_cache
+asteroid_sprites = SpriteCache(max_entries=8)
+
+
+def render_text(font, text, color):
+    return text_cache.render(font, text, color)
+
+
+_fade_palettes = {}
+
+
+def fade_palette(color, steps=100):
+    """color faded from black: entry i is color * i / steps, computed once per color"""
+    key = (color, steps)
+    palette = _fade_palettes.get(key)
+    if palette is None:
+        palette = _fade_palettes[key] = [tuple(int(c * i / steps) for c in color)
+                                         for i in range(steps)]
+    return palette
@@ -0,0 +1,324 @@
+"""Match replays from a seed and the player inputs.
+
+Every random choice in a Match comes from its seed (core.MatchRandom) and
+every input goes through Match.press(), drag() or shot(), which log it
+against the frame it arrived on. A replay file is just that seed, the
+settings the match was played with and the input log, a few kilobytes
+however long the match ran; playing it back feeds the same inputs to a
+fresh Match on the same frames. CPU shots are logged as exact angle and
+power, so playback never runs the CPU search and goes as fast as the
+physics allows.
+
+    python replay.py replays/some.gmr             # fast-forward, check, summarize
+    python replay.py replays/some.gmr --turn 5 --watch
+"""
+import argparse
+import json
+import struct
+import sys
+import time
+import zlib
+
+from accel_field import field_for
+from barnes_hut import EXACT_BELOW, tree_for
+from core import HEIGHT, WIDTH, Match
+from integrators import make_integrator
+
+MAGIC = b"GMRP"
+VERSION = 1
+
+_HEADER = struct.Struct("<4sBQH")  # magic, version, seed, settings length
+_PRESS = struct.Struct("<B")
+_DRAG = struct.Struct("<hh")
+_SHOT = struct.Struct("<dd")
+_END = struct.Struct("<I")  # state_digest() of the last frame
+
+# Opcodes of the input records; each is preceded by the frames since the last one
+_OPS = {'press': (0, _PRESS), 'drag': (1, _DRAG), 'shot': (2, _SHOT), 'end': (3, _END)}
+_NAMES = {code: (name, layout) for name, (code, layout) in _OPS.items()}
+
+# How missiles are stepped, beyond what the Match itself records
+DEFAULT_PHYSICS = {
+    'integrator': None,
+    'adaptive': True,
+    'accel_field_cell': None,
+    'barnes_hut_theta': None,
+}
+
+
+class ReplayError(Exception):
+    """A replay file that can't be read, or a playback that went out of sync"""
+
+
+def match_field(match, physics):
+    """The `field` argument for match.update() under these physics settings"""
+    if physics.get('accel_field_cell'):
+        return field_for(match.gravity_objects, match.black_holes, WIDTH, HEIGHT,
+                         cell=physics['accel_field_cell'])
+    if (physics.get('barnes_hut_theta') and
+            len(match.gravity_objects) + len(match.black_holes) >= EXACT_BELOW):
+        return tree_for(match.gravity_objects, match.black_holes, theta=physics['barnes_hut_theta'])
+    return None
+
+
+def state_digest(match):
+    """CRC of the state a desynced playback would get wrong first"""
+    state = [match.frame, match.turn, match.current_player,
+             match.players.index(match.winner) if match.winner else -1]
+    for pad in match.players:
+        state += [pad.x, pad.y, pad.health, round(float(pad.angle), 9), round(float(pad.power), 9)]
+    for missile in match.missiles:
+        state += [round(missile.x, 6), round(missile.y, 6), missile.active]
+    return zlib.crc32(repr(state).encode())
+
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos):
+    value = shift = 0
+    while True:
+        if pos >= len(data):
+            raise ReplayError("truncated replay")
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+class Replay:
+    """A recorded match: seed, settings, inputs and how many frames it ran.
+
+    settings holds the Match arguments (is_cpu, cpu_difficulty, map_mode)
+    and the physics ones (see DEFAULT_PHYSICS); inputs are Match.inputs
+    tuples. digest is state_digest() at the last frame, checked by playback.
+    """
+
+    def __init__(self, seed, settings, inputs, frames, digest=None):
+        self.seed = seed
+        self.settings = settings
+        self.inputs = inputs
+        self.frames = frames
+        self.digest = digest
+
+    @classmethod
+    def from_match(cls, match, physics=None):
+        settings = {
+            'is_cpu': match.is_cpu,
+            'cpu_difficulty': match.cpu_difficulty,
+            'map_mode': match.map_mode,
+        }
+        settings.update(DEFAULT_PHYSICS)
+        settings.update(physics or {})
+        return cls(match.seed, settings, list(match.inputs), match.frame, state_digest(match))
+
+    def to_bytes(self):
+        settings = json.dumps(self.settings, separators=(',', ':')).encode()
+        out = bytearray(_HEADER.pack(MAGIC, VERSION, self.seed, len(settings)))
+        out += settings
+        frame = 0
+        for input_frame, op, args in self.inputs:
+            code, layout = _OPS[op]
+            _write_varint(out, input_frame - frame)
+            out.append(code)
+            out += layout.pack(*args)
+            frame = input_frame
+        _write_varint(out, self.frames - frame)
+        out.append(_OPS['end'][0])
+        out += _END.pack(self.digest or 0)
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data):
+        if len(data) < _HEADER.size:
+            raise ReplayError("not a replay file")
+        magic, version, seed, settings_size = _HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ReplayError("not a replay file")
+        if version != VERSION:
+            raise ReplayError(f"replay version {version} (this game reads version {VERSION})")
+        pos = _HEADER.size
+        settings = json.loads(data[pos:pos + settings_size])
+        pos += settings_size
+
+        inputs = []
+        frame = 0
+        while True:
+            delta, pos = _read_varint(data, pos)
+            frame += delta
+            if pos >= len(data) or data[pos] not in _NAMES:
+                raise ReplayError("corrupt replay")
+            op, layout = _NAMES[data[pos]]
+            args = layout.unpack_from(data, pos + 1)
+            pos += 1 + layout.size
+            if op == 'end':
+                return cls(seed, settings, inputs, frame, args[0])
+            inputs.append((frame, op, args))
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+
+class Playback:
+    """Steps a fresh Match through a replay, one frame or many at a time.
+
+    Nothing is drawn, so fast_forward() runs as fast as the simulation
+    does; a viewer draws playback.match between step() calls like main.py
+    does. Seeking backwards restarts from the first frame.
+    """
+
+    def __init__(self, replay):
+        self.replay = replay
+        settings = replay.settings
+        self.physics = {name: settings.get(name, default) for name, default in DEFAULT_PHYSICS.items()}
+        self.integrator = None
+        if self.physics['integrator']:
+            self.integrator = make_integrator(self.physics['integrator'],
+                                              adaptive=self.physics['adaptive'])
+        self.match = None
+        self.restart()
+
+    def restart(self):
+        if self.match:
+            self.match.cancel()
+        settings = self.replay.settings
+        self.match = Match(settings['is_cpu'], settings['cpu_difficulty'],
+                           integrator=self.integrator, map_mode=settings['map_mode'],
+                           seed=self.replay.seed)
+        # The CPU's shots are in the log
+        self.match.cpu_ai = None
+        self.position = 0
+        self.turn_starts = {1: 0}  # First frame of each turn played so far
+
+    @property
+    def done(self):
+        return self.match.frame >= self.replay.frames
+
+    def step(self):
+        """Apply this frame's inputs and advance one frame"""
+        match = self.match
+        inputs = self.replay.inputs
+        while self.position < len(inputs) and inputs[self.position][0] == match.frame:
+            _, op, args = inputs[self.position]
+            getattr(match, op)(*args)
+            self.position += 1
+        match.update(match_field(match, self.physics))
+        match.events.clear()
+        self.turn_starts.setdefault(match.turn, match.frame)
+
+    def fast_forward(self, frame=None):
+        """Play on to frame (default: the end), returning the frames played"""
+        end = self.replay.frames if frame is None else min(frame, self.replay.frames)
+        if end < self.match.frame:
+            self.restart()
+        start = self.match.frame
+        while self.match.frame < end:
+            self.step()
+        return self.match.frame - start
+
+    def seek_turn(self, turn):
+        """Play to the first frame of turn (or the end if the match never got there)"""
+        if turn in self.turn_starts:
+            self.fast_forward(self.turn_starts[turn])
+            return
+        while self.match.turn < turn and not self.done:
+            self.step()
+
+    def check(self):
+        """Raise ReplayError if the finished playback doesn't match the recording"""
+        if not self.done:
+            raise ReplayError(f"playback stopped at frame {self.match.frame} of {self.replay.frames}")
+        if self.replay.digest and state_digest(self.match) != self.replay.digest:
+            raise ReplayError("playback went out of sync with the recording")
+
+
+def watch(playback, fps=60):
+    """Show the playback in a window from where it is now (Esc quits, Right skips a turn)"""
+    import pygame
+
+    from render import draw_launch_pad, draw_missile, draw_static_scene
+
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Gravity Missiles replay")
+    clock = pygame.time.Clock()
+    running = True
+    while running and not playback.done:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    running = False
+                elif event.key == pygame.K_RIGHT:
+                    playback.seek_turn(playback.match.turn + 1)
+        playback.step()
+
+        match = playback.match
+        draw_static_scene(screen, None, match.gravity_objects, match.black_holes, match.asteroids,
+                          match.shot_history)
+        for missile in match.missiles:
+            draw_missile(screen, missile)
+        for i, pad in enumerate(match.players):
+            draw_launch_pad(screen, pad, i == match.current_player and not match.missile_fired)
+        pygame.display.flip()
+        clock.tick(fps)
+    pygame.quit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play back a Gravity Missiles replay")
+    parser.add_argument("path")
+    parser.add_argument("--turn", type=int, help="seek to the start of this turn first")
+    parser.add_argument("--watch", action="store_true", help="show the rest in a window")
+    args = parser.parse_args(argv)
+
+    try:
+        replay = Replay.load(args.path)
+    except (OSError, ReplayError) as error:
+        print(f"{args.path}: {error}", file=sys.stderr)
+        return 1
+    settings = replay.settings
+    print(f"seed {replay.seed:#x}, {settings['map_mode']} map, "
+          f"{'CPU ' + settings['cpu_difficulty'] if settings['is_cpu'] else 'PvP'}, "
+          f"{replay.frames} frames, {len(replay.inputs)} inputs, "
+          f"{len(replay.to_bytes())} bytes")
+
+    playback = Playback(replay)
+    if args.turn:
+        playback.seek_turn(args.turn)
+        print(f"turn {playback.match.turn} starts at frame {playback.match.frame}")
+    if args.watch:
+        watch(playback)
+        return 0
+
+    start = time.perf_counter()
+    frames = playback.fast_forward()
+    elapsed = time.perf_counter() - start
+    match = playback.match
+    winner = match.winner.name if match.winner else "nobody"
+    print(f"{frames} frames in {elapsed:.2f} s ({frames / max(elapsed, 1e-9):.0f} frames/s): "
+          f"{match.turn} turns, {winner} won, health {match.player1.health}/{match.player2.health}")
+    try:
+        playback.check()
+    except ReplayError as error:
+        print(error, file=sys.stderr)
+        return 1
+    print("in sync with the recording")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+import accel_field
+from accel_field import AccelerationField, field_for
+from core import HEIGHT, WIDTH, create_launch_pads, create_map
+
+
+def _map(seed):
+    rng = random.Random(seed)
+    launch_pads = create_launch_pads(rng=rng)
+    gravity_objects, black_holes, _ = create_map(launch_pads, rng=rng)
+    return gravity_objects, black_holes
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_interpolation_error_stays_small(seed):
+    report = AccelerationField(*_map(seed), WIDTH, HEIGHT, cell=8).error_report(samples=5000)
+    # Measured at most 0.0023 mean and 0.020 p99 over these seeds
+    assert report['mean_rel'] < 0.003
+    assert report['p99_rel'] < 0.025
+
+
+def test_finer_cells_are_more_accurate():
+    gravity_objects, black_holes = _map(0)
+    errors = [AccelerationField(gravity_objects, black_holes, WIDTH, HEIGHT,
+                                cell=cell).error_report(samples=5000)['mean_rel']
+              for cell in (16, 8, 4)]
+    assert errors == sorted(errors, reverse=True)
+
+
+def test_sample_matches_sample_many():
+    field = AccelerationField(*_map(1), WIDTH, HEIGHT)
+    rng = random.Random(1)
+    x = np.array([rng.uniform(0, WIDTH) for _ in range(500)])
+    y = np.array([rng.uniform(0, HEIGHT) for _ in range(500)])
+    ax, ay = field.sample_many(x, y)
+    for px, py, fx, fy in zip(x.tolist(), y.tolist(), ax.tolist(), ay.tolist()):
+        sx, sy = field.sample(px, py)
+        assert math.isclose(sx, fx, rel_tol=1e-12, abs_tol=1e-15)
+        assert math.isclose(sy, fy, rel_tol=1e-12, abs_tol=1e-15)
+
+
+def test_field_for_rebuilds_only_when_the_map_changes(monkeypatch):
+    monkeypatch.setattr(accel_field, "_cached_field", None)
+    gravity_objects, black_holes = _map(2)
+    field = field_for(gravity_objects, black_holes, WIDTH, HEIGHT, cell=8)
+    assert field_for(gravity_objects, black_holes, WIDTH, HEIGHT, cell=8) is field
+
+    # Other settings, then another map, each get a new field
+    coarser = field_for(gravity_objects, black_holes, WIDTH, HEIGHT, cell=16)
+    assert coarser is not field
+    other = field_for(*_map(3), WIDTH, HEIGHT, cell=16)
+    assert other is not coarser
+    assert other.matches(*_map(3))
+    assert not other.matches(gravity_objects, black_holes)
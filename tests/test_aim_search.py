@@ -0,0 +1,104 @@
+import multiprocessing
+import random
+import time
+
+import numpy as np
+import pytest
+
+import aim_search
+from accel_field import field_for
+from aim_search import GameMap, ParallelAimSearch, _init_worker, _search_shard
+from barnes_hut import tree_for
+from core import HEIGHT, WIDTH, create_launch_pads, create_map
+from physics import search_shot
+
+BUDGET = 240
+
+
+@pytest.fixture(scope="module")
+def pool():
+    search = ParallelAimSearch(2)
+    yield search
+    search.shutdown()
+
+
+def _scene(seed, mode="classic"):
+    rng = random.Random(seed)
+    launch_pads = create_launch_pads(rng=rng)
+    gravity_objects, black_holes, _ = create_map(launch_pads, mode, rng=rng)
+    return launch_pads, gravity_objects, black_holes
+
+
+def _sharded(pad, target, gravity_objects, black_holes, field, shards=2):
+    """What the pool should find: search_shot over each shard's angles and budget, merged"""
+    edges = np.linspace(-180, 180, shards + 1)
+    share, extra = divmod(BUDGET, shards)
+    best = None
+    for shard, (start, stop) in enumerate(zip(edges[:-1], edges[1:])):
+        found = search_shot(pad.x, pad.y, target.x, target.y, gravity_objects, black_holes,
+                            WIDTH, HEIGHT, budget=share + (shard < extra),
+                            angle_range=(float(start), float(stop)), field=field)
+        if best is None or found[0] < best[0]:
+            best = found
+    return best[1], best[2]
+
+
+def _wait(search, timeout=60):
+    deadline = time.perf_counter() + timeout
+    while not search.done():
+        assert time.perf_counter() < deadline, "the search never finished"
+        time.sleep(0.01)
+    return search.result()
+
+
+@pytest.mark.parametrize("model", ["exact", "field", "tree"])
+def test_pool_finds_the_shot_search_shot_finds(pool, model):
+    mode = "galaxy" if model == "tree" else "classic"
+    (pad, target), gravity_objects, black_holes = _scene(3, mode)
+    field = None
+    if model == "field":
+        field = field_for(gravity_objects, black_holes, WIDTH, HEIGHT, cell=8)
+    elif model == "tree":
+        field = tree_for(gravity_objects, black_holes, theta=0.5)
+        assert not field.exact
+
+    pool.start(pad, target, gravity_objects, black_holes, BUDGET, WIDTH, HEIGHT, field=field)
+    assert _wait(pool) == _sharded(pad, target, gravity_objects, black_holes, field)
+    assert 0 < pool.simulations <= BUDGET
+
+
+def test_one_shard_is_search_shot():
+    (pad, target), gravity_objects, black_holes = _scene(5)
+    search = ParallelAimSearch(1)
+    try:
+        search.start(pad, target, gravity_objects, black_holes, BUDGET, WIDTH, HEIGHT)
+        found = _wait(search)
+    finally:
+        search.shutdown()
+    _, angle, power, _ = search_shot(pad.x, pad.y, target.x, target.y, gravity_objects,
+                                     black_holes, WIDTH, HEIGHT, budget=BUDGET)
+    assert found == (angle, power)
+
+
+def test_cancel_drops_the_search(pool):
+    (pad, target), gravity_objects, black_holes = _scene(6)
+    pool.start(pad, target, gravity_objects, black_holes, BUDGET, WIDTH, HEIGHT)
+    pool.cancel()
+    assert pool.done()
+    assert pool.result() is None
+
+
+def test_a_new_search_ignores_the_one_it_replaced(pool):
+    (pad, target), gravity_objects, black_holes = _scene(7)
+    (_, other), _, _ = _scene(8)
+    pool.start(pad, other, gravity_objects, black_holes, BUDGET, WIDTH, HEIGHT)
+    pool.start(pad, target, gravity_objects, black_holes, BUDGET, WIDTH, HEIGHT)
+    assert _wait(pool) == _sharded(pad, target, gravity_objects, black_holes, None)
+
+
+def test_queued_shards_of_a_cancelled_search_do_nothing(monkeypatch):
+    monkeypatch.setattr(aim_search, "_generation", None)
+    _init_worker(multiprocessing.Value('i', 2))
+    game_map = GameMap(100, 400, 1300, 400, (), (), WIDTH, HEIGHT)
+    assert _search_shard(1, game_map, (-180, 180), BUDGET) is None
+    assert _search_shard(2, game_map, (-180, 180), BUDGET) is not None
@@ -0,0 +1,90 @@
+import pytest
+
+from audio import MIN_GAIN, NullAudio, SoundManager
+from core import HEIGHT, WIDTH
+
+
+class _Channels(NullAudio):
+    """NullAudio that records what it was asked to play; with hold a channel stays busy once used"""
+    silent = False
+
+    def __init__(self, hold=True):
+        self.plays = []
+        self.used = set()
+        self.hold = hold
+
+    def play(self, channel, name, volume):
+        self.plays.append((channel, name, volume))
+        self.used.add(channel)
+        return True
+
+    def busy(self, channel):
+        return self.hold and channel in self.used
+
+
+def test_null_audio_does_nothing():
+    sound = SoundManager(NullAudio())
+    sound.play('explode', 10, 10)
+    sound.update()
+    assert sound.pending == {} and sound.played == 0
+
+
+@pytest.mark.parametrize("window", [1, 3, 5])
+def test_one_play_per_sound_per_window(window):
+    backend = _Channels(hold=False)
+    sound = SoundManager(backend, channels=8, window=window)
+    for _ in range(12):
+        sound.play('explode', 100, 100)
+        sound.play('explode', 200, 100)
+        sound.update()
+    assert sound.played == len(backend.plays) == -(-12 // window)
+    # Each frame's second request, and every frame inside the window
+    assert sound.coalesced == 12 + 12 - sound.played
+
+
+def test_loudest_request_wins():
+    backend = _Channels()
+    sound = SoundManager(backend)
+    # Far, near, then far again: the near one is played
+    sound.play('explode', 0, 0)
+    sound.play('explode', WIDTH / 2, HEIGHT / 2)
+    sound.play('explode', WIDTH, HEIGHT)
+    sound.update()
+    assert backend.plays == [(0, 'explode', 1.0)]
+    assert sound.coalesced == 2
+
+    sound.play('fire', 0, 0)
+    sound.update()
+    (_, _, volume), = backend.plays[1:]
+    assert MIN_GAIN <= volume < 1.0
+
+
+def test_channel_cap():
+    backend = _Channels()
+    sound = SoundManager(backend, channels=2)
+    for name in ('fire', 'choose', 'explode', 'hit'):
+        sound.play(name)
+    sound.update()
+    # The two highest priorities get the two channels, the rest are dropped
+    assert [name for _, name, _ in backend.plays] == ['hit', 'explode']
+    assert {channel for channel, _, _ in backend.plays} == {0, 1}
+    assert sound.dropped == 2 and sound.stolen == 0
+
+
+def test_hit_steals_an_explosions_channel():
+    backend = _Channels()
+    sound = SoundManager(backend, channels=1, window=1)
+    sound.play('explode', 10, 10)
+    sound.update()
+    sound.play('hit', 10, 10)
+    sound.update()
+    assert backend.plays[-1][:2] == (0, 'hit')
+    assert sound.stolen == 1
+
+    # ...but an explosion can't take it back, nor a fire take either
+    sound.play('explode', 10, 10)
+    sound.update()
+    sound.play('fire')
+    sound.update()
+    assert [name for _, name, _ in backend.plays] == ['explode', 'hit']
+    assert sound.dropped == 2
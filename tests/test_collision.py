@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+from collision import SpatialHash, asteroid_index
+from core import Asteroid
+
+CELL = 50
+
+
+def _circles(rng, count):
+    """Random circles, a third centred on cell borders and some wider than a cell"""
+    circles = []
+    for k in range(count):
+        x = rng.uniform(-100, 600)
+        y = rng.uniform(-100, 600)
+        if k % 3 == 0:
+            # On a vertical or horizontal border, or a corner
+            x = round(x / CELL) * CELL
+            if k % 2:
+                y = round(y / CELL) * CELL
+        radius = rng.uniform(60, 160) if k % 5 == 0 else rng.uniform(1, 30)
+        circles.append((k, x, y, radius))
+    return circles
+
+
+def _points(rng, count):
+    points = [(rng.uniform(-150, 650), rng.uniform(-150, 650)) for _ in range(count)]
+    # Points exactly on cell borders and corners
+    points += [(rng.randrange(-2, 13) * CELL, rng.uniform(-150, 650)) for _ in range(count // 4)]
+    points += [(rng.randrange(-2, 13) * CELL, rng.randrange(-2, 13) * CELL) for _ in range(count // 4)]
+    return points
+
+
+def _hits(candidates, x, y):
+    return [k for k, cx, cy, r in candidates if (cx - x)**2 + (cy - y)**2 <= r * r]
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_query_matches_a_brute_force_check(seed):
+    rng = random.Random(seed)
+    circles = _circles(rng, 60)
+    index = SpatialHash(CELL)
+    for circle in circles:
+        index.insert(circle, circle[1], circle[2], circle[3])
+
+    for x, y in _points(rng, 800):
+        candidates = list(index.query(x, y))
+        # Same hits, in the original list order
+        assert _hits(candidates, x, y) == _hits(circles, x, y)
+        assert candidates == sorted(candidates)
+
+
+def test_asteroid_index_keeps_list_order():
+    rng = random.Random(1)
+    asteroids = [Asteroid(rng.uniform(0, 400), rng.uniform(0, 400), rng=rng) for _ in range(40)]
+    # Cells smaller than any asteroid, so each one spans several
+    index = asteroid_index(asteroids, cell=20)
+    for _ in range(500):
+        x, y = rng.uniform(0, 400), rng.uniform(0, 400)
+        expected = [a for a in asteroids if (a.x - x)**2 + (a.y - y)**2 <= a.radius**2]
+        found = [a for a in index.query(x, y) if (a.x - x)**2 + (a.y - y)**2 <= a.radius**2]
+        assert found == expected
+        candidates = list(index.query(x, y))
+        assert candidates == sorted(candidates, key=asteroids.index)
@@ -0,0 +1,41 @@
+import pytest
+
+from core import HEIGHT, WIDTH, Missile
+from integrators import make_integrator, trajectory
+from test_physics import MAPS, _volley
+
+FRAMES = 200
+
+
+@pytest.mark.parametrize("name", ["euler", "leapfrog", "rk4"])
+@pytest.mark.parametrize("adaptive", [False, True])
+def test_carried_acceleration_matches_fresh_evaluation(name, adaptive):
+    """Missile.update reusing last frame's acceleration flies the same path"""
+    integrator = make_integrator(name, adaptive=adaptive)
+    for seed in range(0, MAPS, 5):
+        gravity_objects, black_holes, launches = _volley(seed)
+        for launch in launches:
+            missile = Missile(*launch, (255, 255, 255))
+            x, y, vx, vy = launch
+            for frame in range(FRAMES):
+                if frame % 40 == 39:
+                    # Thrust changes velocity only, so the carried acceleration still holds
+                    missile.apply_thrust()
+                    vx, vy = missile.vx, missile.vy
+                missile.update(gravity_objects, black_holes, integrator=integrator)
+                state = integrator.step(x, y, vx, vy, gravity_objects, black_holes)
+                if state is None:
+                    assert not missile.active
+                    break
+                x, y, vx, vy, _ = state
+                assert (missile.x, missile.y, missile.vx, missile.vy) == (x, y, vx, vy)
+                if not missile.active:
+                    break  # Left the screen
+
+
+def test_leapfrog_evaluates_once_per_fixed_step_frame():
+    gravity_objects, black_holes, launches = _volley(0)
+    x, y, vx, vy = launches[0]
+    points, _, _, evals = trajectory(make_integrator("leapfrog"), x, y, vx, vy,
+                                     gravity_objects, black_holes, WIDTH, HEIGHT, FRAMES)
+    assert evals == len(points)
@@ -0,0 +1,52 @@
+import random
+
+from core import KEY_P, Match, missile_pool
+
+
+def _play_turn(match, rng, end_after=None):
+    """Fire one shot and fly it until the turn ends, or press P after end_after frames"""
+    turn = match.turn
+    match.shot(rng.uniform(0, 360), rng.uniform(3, 20))
+    frames = 0
+    while match.turn == turn and not match.game_over:
+        if frames == end_after or frames == 2000:
+            match.press(KEY_P)
+            break
+        match.update()
+        match.events.clear()
+        frames += 1
+
+
+def test_firing_stops_allocating_after_warm_up():
+    rng = random.Random(3)
+    match = Match(seed=3)
+    # Warm up: enough turns (some cut short) to fill the pool past any one shot's needs
+    for turn in range(12):
+        _play_turn(match, rng, end_after=40 if turn % 3 == 0 else None)
+        if match.game_over:
+            match.cancel()
+            match = Match(seed=3 + turn)
+
+    created = missile_pool.created
+    reused = missile_pool.reused
+    for turn in range(12):
+        _play_turn(match, rng, end_after=40 if turn % 3 == 0 else None)
+        if match.game_over:
+            match.cancel()
+            match = Match(seed=30 + turn)
+    match.cancel()
+    assert missile_pool.reused > reused
+    assert missile_pool.created == created
+
+
+def test_ending_a_turn_returns_its_missiles():
+    match = Match(seed=5)
+    released = missile_pool.released
+    missile = match.shot(45, 10)
+    for _ in range(20):
+        match.update()
+    match.press(KEY_P)
+    assert missile.pooled and not missile.active
+    assert match.missiles == [] and match.flying == []
+    assert missile_pool.released > released
+    match.cancel()
@@ -0,0 +1,141 @@
+import pytest
+
+from core import KEY_RIGHT, Match
+from netplay import (_LENGTH, DIGEST, INPUTS, Lockstep, NetError, NetSession, _Stream,
+                     self_test)
+from replay import state_digest
+
+
+class _Recorder:
+    """Stands in for a NetSession under a _Stream"""
+
+    def __init__(self):
+        self.messages = []
+
+    def _message_received(self, message, size):
+        self.messages.append((message, size))
+
+
+def _framed(message):
+    return _LENGTH.pack(len(message)) + message
+
+
+def test_stream_reassembles_messages_split_anywhere():
+    messages = [b"\x01abc", b"", b"\x02" + bytes(range(200)), b"\x03"]
+    data = b"".join(_framed(message) for message in messages)
+    for chunk in (1, 2, 3, 7, len(data)):
+        recorder = _Recorder()
+        stream = _Stream(recorder)
+        for start in range(0, len(data), chunk):
+            stream.data_received(data[start:start + chunk])
+        assert recorder.messages == [(m, _LENGTH.size + len(m)) for m in messages]
+        assert not stream.buffer
+
+
+def test_stream_holds_a_truncated_message_back():
+    recorder = _Recorder()
+    stream = _Stream(recorder)
+    stream.data_received(_framed(b"\x01hello")[:-1])
+    assert recorder.messages == []
+    stream.data_received(b"o")
+    assert recorder.messages == [(b"\x01hello", 8)]
+
+
+def test_inputs_round_trip_between_peers():
+    host = Lockstep(0, input_delay=4, batch_frames=1)
+    guest = Lockstep(1, input_delay=4, batch_frames=1)
+    match = Match(seed=3)
+    host.queue('press', KEY_RIGHT)
+    host.queue('drag', 100, -200)
+    assert host.advance(match)
+    (message,) = host.outbox
+    guest.receive(message)
+    assert guest.known[0] == 5
+    assert guest.scheduled[0] == {4: [('press', (KEY_RIGHT,)), ('drag', (100, -200))]}
+
+
+@pytest.mark.parametrize("message", [
+    b"",
+    bytes([INPUTS]),
+    bytes([INPUTS, 4, 0, 0]),
+    bytes([DIGEST, 1, 2]),
+    bytes([99, 1, 2, 3]),
+])
+def test_lockstep_rejects_truncated_and_unknown_messages(message):
+    with pytest.raises(NetError):
+        Lockstep(1, input_delay=4).receive(message)
+
+
+def test_lockstep_rejects_corrupt_input_records():
+    host = Lockstep(0, input_delay=4, batch_frames=1)
+    host.queue('press', KEY_RIGHT)
+    host.advance(Match(seed=3))
+    message = bytearray(host.outbox[0])
+    message[-2] = 77  # Op code of the one record
+    with pytest.raises(NetError, match="corrupt"):
+        Lockstep(1, input_delay=4).receive(bytes(message))
+    # Inputs must pick up where the last message left off
+    with pytest.raises(NetError, match="expected"):
+        Lockstep(1, input_delay=5).receive(host.outbox[0])
+
+
+@pytest.mark.parametrize("message", [b"", b"\x00GMNP", b"\x00" + b"x" * 20, b"\x07garbage"])
+def test_session_fails_on_a_garbage_hello(message):
+    session = NetSession()
+    try:
+        session._message_received(message, len(message) + _LENGTH.size)
+        assert session.error
+        assert not session.connected
+    finally:
+        session.close()
+
+
+def test_input_takes_effect_input_delay_frames_later_on_both_peers():
+    delay = 6
+    peers = [Lockstep(0, delay), Lockstep(1, delay)]
+    matches = [Match(seed=5), Match(seed=5)]
+    typed_on = 10
+    angles = [[], []]
+    for frame in range(30):
+        if frame == typed_on:
+            peers[0].queue('press', KEY_RIGHT)  # Player 1 aims (their turn)
+        for i, (peer, match) in enumerate(zip(peers, matches)):
+            assert peer.advance(match)
+            angles[i].append(match.player1.angle)
+        for i, peer in enumerate(peers):
+            for message in peer.outbox:
+                peers[1 - i].receive(message)
+            peer.outbox.clear()
+
+    assert angles[0] == angles[1]
+    start = angles[0][0]
+    # angles[i][f] is the angle after frame f ran
+    assert angles[0][typed_on + delay - 1] == start
+    assert angles[0][typed_on + delay] == start + .5
+    expected = [(typed_on + delay, 'press', (KEY_RIGHT,))]
+    assert matches[0].inputs == matches[1].inputs == expected
+    assert peers[0].stalls == peers[1].stalls == 0
+
+
+def test_advance_stalls_without_the_other_peers_inputs():
+    delay = 3
+    host = Lockstep(0, delay)
+    match = Match(seed=5)
+    for _ in range(delay):
+        assert host.advance(match)
+    assert not host.advance(match)
+    assert not host.advance(match)
+    assert host.stalls == 2
+    assert match.frame == delay
+    # Stalling flushes what the host has, so the guest can't be waiting on it
+    assert host.outbox and host.outbox[-1][0] == INPUTS
+
+
+def test_self_test_peers_stay_in_sync_over_a_slow_link():
+    sessions, matches = self_test(seconds=2, delay=0.02, jitter=0.01, input_delay=4,
+                                  batch_frames=2, seed=2)
+    assert all(session.error == "the session was closed" for session in sessions)
+    assert matches[0].frame == matches[1].frame == 120
+    assert matches[0].inputs and matches[0].inputs == matches[1].inputs
+    assert state_digest(matches[0]) == state_digest(matches[1])
+    assert all(session.stats()['messages_received'] > 0 for session in sessions)
@@ -0,0 +1,183 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+from core import HEIGHT, WIDTH, CPUPlayer, Missile, create_launch_pads, create_map
+from physics import (MissileSwarm, ShotSearch, TrajectoryCache, search_shot, simulate_shots,
+                     trajectory_cache)
+
+MAPS = 20
+MISSILES = 40
+FRAMES = 300
+
+
+def _volley(seed):
+    """A seeded map and MISSILES (x, y, vx, vy) launches scattered over it"""
+    rng = random.Random(seed)
+    launch_pads = create_launch_pads(rng=rng)
+    gravity_objects, black_holes, _ = create_map(launch_pads, rng=rng)
+    launches = []
+    for _ in range(MISSILES):
+        angle = math.radians(rng.uniform(-180, 180))
+        speed = rng.uniform(3, 20)
+        launches.append((rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT),
+                         math.cos(angle) * speed, math.sin(angle) * speed))
+    return gravity_objects, black_holes, launches
+
+
+def _state(missile):
+    return (missile.x, missile.y, missile.vx, missile.vy, missile.active)
+
+
+@pytest.mark.parametrize("seed", range(MAPS))
+def test_swarm_matches_missile_update(seed):
+    gravity_objects, black_holes, launches = _volley(seed)
+    single = [Missile(*launch, (255, 255, 255)) for launch in launches]
+    batched = [Missile(*launch, (255, 255, 255)) for launch in launches]
+    swarm = MissileSwarm(WIDTH, HEIGHT)
+
+    for frame in range(FRAMES):
+        # Thrusts poke the missiles between steps, as in a match
+        if frame % 25 == 0:
+            for a, b in zip(single[frame % 7::7], batched[frame % 7::7]):
+                assert a.apply_thrust() == b.apply_thrust()
+        for missile in single:
+            missile.update(gravity_objects, black_holes)
+        swarm.update(batched, gravity_objects, black_holes)
+
+        for a, b in zip(single, batched):
+            assert _state(a) == _state(b)
+            assert a.thrust_cooldown == b.thrust_cooldown
+    for a, b in zip(single, batched):
+        assert a.trail.to_list() == b.trail.to_list()
+
+
+def test_swarm_parity_covers_captures_and_boundary_kills():
+    """The seeded volleys above end in both ways a missile can stop"""
+    captured = out_of_bounds = 0
+    for seed in range(MAPS):
+        gravity_objects, black_holes, launches = _volley(seed)
+        for launch in launches:
+            missile = Missile(*launch, (255, 255, 255))
+            for _ in range(FRAMES):
+                missile.update(gravity_objects, black_holes)
+                if not missile.active:
+                    break
+            if not missile.active:
+                inside = 0 <= missile.x <= WIDTH and 0 <= missile.y <= HEIGHT
+                captured += inside
+                out_of_bounds += not inside
+    assert captured > 0
+    assert out_of_bounds > 0
+
+
+def _shots(seed, count=300):
+    """A seeded map, its two pads and count (angle, power) candidates"""
+    rng = random.Random(seed)
+    launch_pads = create_launch_pads(rng=rng)
+    gravity_objects, black_holes, _ = create_map(launch_pads, rng=rng)
+    angles = np.array([rng.uniform(-180, 180) for _ in range(count)])
+    powers = np.array([rng.uniform(8, 20) for _ in range(count)])
+    return launch_pads, gravity_objects, black_holes, angles, powers
+
+
+@pytest.mark.parametrize("seed", range(MAPS))
+def test_simulate_shots_matches_simulate_shot(seed):
+    (pad, target), gravity_objects, black_holes, angles, powers = _shots(seed)
+    cpu = CPUPlayer("hard")
+    batched = simulate_shots(pad.x, pad.y, target.x, target.y, angles, powers,
+                             gravity_objects, black_holes, WIDTH, HEIGHT)
+    for angle, power, score in zip(angles.tolist(), powers.tolist(), batched.tolist()):
+        single = cpu.simulate_shot(pad, target, angle, power, gravity_objects, black_holes)
+        if math.isinf(single):
+            assert math.isinf(score)
+        else:
+            # NumPy's vectorized cos/sin/sqrt may round the last bit differently
+            assert math.isclose(score, single, rel_tol=1e-12)
+
+
+@pytest.mark.parametrize("seed", range(0, MAPS, 4))
+def test_trajectory_cache_scores_match_simulate_shots(seed):
+    (pad, target), gravity_objects, black_holes, angles, powers = _shots(seed)
+    cache = TrajectoryCache()
+    bodies = (gravity_objects, black_holes, WIDTH, HEIGHT)
+    for target_x, target_y in [(target.x, target.y), (target.x - 120, target.y + 40)]:
+        cached = cache.scores("map", pad.x, pad.y, target_x, target_y, angles, powers, *bodies)
+        direct = simulate_shots(pad.x, pad.y, target_x, target_y, angles, powers, *bodies)
+        assert cached.tolist() == direct.tolist()
+    # The moved target was scored on the paths flown for the first one
+    assert cache.misses == len(angles)
+    assert cache.hits == len(angles)
+
+
+def test_trajectory_cache_starts_over_on_a_new_map():
+    (pad, target), gravity_objects, black_holes, angles, powers = _shots(1)
+    (_, other_target), other_objects, other_holes, _, _ = _shots(2)
+    cache = TrajectoryCache()
+    cache.scores("first", pad.x, pad.y, target.x, target.y, angles, powers,
+                 gravity_objects, black_holes, WIDTH, HEIGHT)
+
+    # Same launches on another map: nothing of the old map's paths is reused
+    cached = cache.scores("second", pad.x, pad.y, other_target.x, other_target.y, angles, powers,
+                          other_objects, other_holes, WIDTH, HEIGHT)
+    direct = simulate_shots(pad.x, pad.y, other_target.x, other_target.y, angles, powers,
+                            other_objects, other_holes, WIDTH, HEIGHT)
+    assert cached.tolist() == direct.tolist()
+    assert cache.map_key == "second"
+    assert cache.hits == 0
+    assert cache.misses == 2 * len(angles)
+    assert cache.stats()['entries'] == len(angles)
+
+
+def test_hard_cpu_aims_the_same_with_or_without_the_cache():
+    trajectory_cache.clear()
+    for seed in range(4):
+        rng = random.Random(seed)
+        pad, target = create_launch_pads(rng=rng)
+        gravity_objects, black_holes, _ = create_map([pad, target], rng=rng)
+        cached = CPUPlayer("hard", rng=random.Random(seed), map_id=("test", seed))
+        uncached = CPUPlayer("hard", rng=random.Random(seed))
+        # Later turns aim from the same pad at a target that has moved
+        for turn in range(3):
+            target.x -= 40 * turn
+            cached.aim(pad, target, gravity_objects, black_holes)
+            with_cache = (pad.angle, pad.power)
+            uncached.aim(pad, target, gravity_objects, black_holes)
+            assert (pad.angle, pad.power) == with_cache
+        assert cached.simulations < uncached.simulations
+    trajectory_cache.clear()
+
+
+@pytest.mark.parametrize("budget", [20, 100, 144, 480])
+@pytest.mark.parametrize("seed", range(3))
+def test_shot_search_stays_within_budget(seed, budget):
+    (pad, target), gravity_objects, black_holes, _, _ = _shots(seed, count=0)
+    search = ShotSearch(pad.x, pad.y, target.x, target.y, gravity_objects, black_holes,
+                        WIDTH, HEIGHT, budget=budget)
+    while not search.done:
+        search.step()
+        assert search.evaluated <= budget
+    assert search.simulations == search.evaluated
+
+
+@pytest.mark.parametrize("map_key", [None, "sliced"])
+@pytest.mark.parametrize("seed", range(3))
+def test_time_sliced_search_ends_on_the_same_shot(seed, map_key):
+    (pad, target), gravity_objects, black_holes, _, _ = _shots(seed, count=0)
+    args = (pad.x, pad.y, target.x, target.y, gravity_objects, black_holes, WIDTH, HEIGHT)
+    whole = search_shot(*args)
+
+    trajectory_cache.clear()
+    search = ShotSearch(*args, map_key=map_key)
+    slices = 0
+    while not search.done:
+        # A deadline already gone: one frame of flight per call
+        search.step(deadline=0)
+        slices += 1
+    trajectory_cache.clear()
+    # Scored through the cache, repeated shots aren't flown twice
+    assert search.result() == whole[:3]
+    assert search.evaluated == whole[3]
+    assert slices > 100
@@ -0,0 +1,73 @@
+import math
+import random
+import re
+
+import pytest
+
+from core import HEIGHT, WIDTH, MAP_MODES, create_launch_pads, create_map
+from placement import SEPARATIONS, PlacementError, Placer, separation
+
+
+def _kind(obj):
+    return 'rock' if getattr(obj, 'planet_type', None) == 'rock' else 'planet'
+
+
+@pytest.mark.parametrize("mode", MAP_MODES)
+@pytest.mark.parametrize("seed", range(10))
+def test_maps_place_every_object_at_its_separation(mode, seed):
+    rng = random.Random(seed)
+    launch_pads = create_launch_pads(rng=rng)
+    gravity_objects, black_holes, asteroids = create_map(launch_pads, mode, rng=rng)
+
+    placed = ([(pad, 'pad') for pad in launch_pads] +
+              [(obj, _kind(obj)) for obj in gravity_objects] +
+              [(bh, 'black_hole') for bh in black_holes] +
+              [(asteroid, 'asteroid') for asteroid in asteroids])
+    counts = {}
+    for _, kind in placed:
+        counts[kind] = counts.get(kind, 0) + 1
+    assert counts['black_hole'] == 1
+    assert counts['asteroid'] == 1
+    assert counts.get('planet', 0) == {"classic": 3, "asteroid_belt": 2, "galaxy": 0}[mode]
+    assert counts.get('rock', 0) == {"classic": 0, "asteroid_belt": 180, "galaxy": 240}[mode]
+
+    for i, (a, kind_a) in enumerate(placed):
+        for b, kind_b in placed[i + 1:]:
+            d = separation(kind_a, kind_b)
+            assert math.hypot(a.x - b.x, a.y - b.y) >= d, (kind_a, kind_b)
+
+
+def test_place_keeps_the_separations():
+    placer = Placer()
+    placer.add(700, 400, 'black_hole')
+    rng = random.Random(3)
+    planets = placer.place('planet', 3, (0, 0, WIDTH, HEIGHT), rng)
+    rocks = placer.place('rock', 300, (0, 0, WIDTH, HEIGHT), rng)
+    assert len(planets) == 3
+    assert len(rocks) == 300
+    for points, kind in [(planets, 'planet'), (rocks, 'rock')]:
+        for i, (x, y) in enumerate(points):
+            assert math.hypot(x - 700, y - 400) >= separation(kind, 'black_hole')
+            for px, py in points[i + 1:]:
+                assert math.hypot(x - px, y - py) >= SEPARATIONS[(kind, kind)]
+    for x, y in rocks:
+        for px, py in planets:
+            assert math.hypot(x - px, y - py) >= SEPARATIONS[('planet', 'rock')]
+
+
+def test_impossible_placement_raises():
+    placer = Placer()
+    with pytest.raises(PlacementError) as error:
+        placer.place('planet', 50, (0, 0, 1400, 800), random.Random(0))
+    best = int(re.match(r"only (\d+) of 50 planet positions fit", str(error.value)).group(1))
+    assert 0 < best < 50
+    assert placer.count == 0  # Nothing was kept from the failed attempts
+
+
+def test_overlapping_kind_stops_growing_at_its_count():
+    """A kind with no self-separation fills a pocket the darts mostly miss"""
+    placer = Placer({('a', 'b'): 690, ('a', 'c'): 10})
+    placer.add(500, 500, 'b')
+    points = placer.place('a', 100, (0, 0, 1000, 1000), random.Random(1))
+    assert len(points) == 100
+    assert all(math.hypot(x - 500, y - 500) >= 690 for x, y in points)
@@ -0,0 +1,20 @@
+from core import Match
+from preview import TrajectoryPreview
+
+
+def test_refined_path_shares_one_min_frames_allowance():
+    """With the deadline already gone, a call flies min_frames in all, not per path"""
+    match = Match(seed=1)
+    pad = match.current
+    preview = TrajectoryPreview(budget=-1, min_frames=20, angle_step=10, power_step=10)
+
+    preview.path(match)
+    assert preview.frames == 20
+
+    # Same bucket, different aim: the exact path takes over from the cached one
+    pad.angle += 0.5
+    preview.path(match)
+    assert preview.frames == 40
+    path = preview.paths[preview.key(match, pad)]
+    assert path.angle == pad.angle
+    assert path.frames == 20
@@ -0,0 +1,107 @@
+import math
+import random
+
+import pytest
+
+from core import HISTORY_TOLERANCE, TRAIL_LENGTH, TrailBuffer, simplify_trail
+
+
+@pytest.mark.parametrize("count", [0, 1, 4, 5, 6, 12, 23])
+def test_trail_buffer_keeps_the_newest_points_oldest_first(count):
+    trail = TrailBuffer(capacity=5)
+    points = [(i, -i) for i in range(count)]
+    for point in points:
+        trail.append(point)
+    assert len(trail) == min(count, 5)
+    assert trail.to_list() == points[-5:]
+    assert list(trail) == points[-5:]
+
+
+def test_trail_buffer_clear_starts_over():
+    trail = TrailBuffer(capacity=3)
+    for i in range(7):
+        trail.append((i, i))
+    storage = trail.points
+    trail.clear()
+    assert trail.to_list() == [] and len(trail) == 0
+    for i in range(4):
+        trail.append((i, 0))
+    assert trail.to_list() == [(1, 0), (2, 0), (3, 0)]
+    assert trail.points is storage
+
+
+def _kept_indices(points, flat):
+    """Which of points simplify_trail kept (it keeps them in order)"""
+    kept = [(flat[i], flat[i + 1]) for i in range(0, len(flat), 2)]
+    indices = []
+    for i, (x, y) in enumerate(points):
+        if len(indices) < len(kept) and (abs(x - kept[len(indices)][0]) < 1e-3 and
+                                         abs(y - kept[len(indices)][1]) < 1e-3):
+            indices.append(i)
+    assert len(indices) == len(kept)
+    return indices
+
+
+def _segment_distance(point, start, end):
+    px, py = point[0] - start[0], point[1] - start[1]
+    dx, dy = end[0] - start[0], end[1] - start[1]
+    length_sq = dx*dx + dy*dy
+    t = max(0.0, min(1.0, (px*dx + py*dy) / length_sq)) if length_sq else 0.0
+    return math.hypot(px - t*dx, py - t*dy)
+
+
+def _arc(rng, n=TRAIL_LENGTH):
+    """A missile-like curving path, bending and speeding up at random"""
+    x, y = rng.uniform(0, 1400), rng.uniform(0, 800)
+    heading = rng.uniform(0, 2 * math.pi)
+    speed = rng.uniform(2, 8)
+    turn = 0.0
+    points = []
+    for _ in range(n):
+        turn += rng.gauss(0, 0.01)
+        heading += turn
+        speed = max(0.5, speed + rng.gauss(0, 0.1))
+        x += speed * math.cos(heading)
+        y += speed * math.sin(heading)
+        points.append((x, y))
+    return points
+
+
+def _walk(rng, n=TRAIL_LENGTH):
+    """A jagged path that doubles back on itself"""
+    x = y = 0.0
+    points = []
+    for _ in range(n):
+        x += rng.uniform(-5, 5)
+        y += rng.uniform(-5, 5)
+        points.append((x, y))
+    return points
+
+
+@pytest.mark.parametrize("path", [_arc, _walk])
+@pytest.mark.parametrize("tolerance", [0.25, HISTORY_TOLERANCE, 3.0])
+def test_simplify_trail_stays_within_tolerance(path, tolerance):
+    for seed in range(20):
+        points = path(random.Random(seed))
+        flat = simplify_trail(points, tolerance)
+        indices = _kept_indices(points, flat)
+        # Both ends are kept
+        assert indices[0] == 0 and indices[-1] == len(points) - 1
+        for first, last in zip(indices, indices[1:]):
+            for i in range(first + 1, last):
+                # array('f') rounding aside, within tolerance of the kept segment
+                assert _segment_distance(points[i], points[first], points[last]) <= tolerance + 1e-3
+
+
+@pytest.mark.parametrize("points", [
+    [(i, 2 * i + 1) for i in range(50)],
+    [(10.0, 300 - 3 * i) for i in range(80)],
+    [(i * 0.5, 7.0) for i in range(3)],
+])
+def test_simplify_trail_collapses_a_straight_line(points):
+    assert list(simplify_trail(points)) == [*points[0], *points[-1]]
+
+
+@pytest.mark.parametrize("points", [[], [(1.0, 2.0)], [(1.0, 2.0), (3.0, 4.0)]])
+def test_simplify_trail_keeps_short_trails(points):
+    assert list(simplify_trail(points)) == [c for point in points for c in point]